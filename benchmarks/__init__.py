@@ -0,0 +1,8 @@
+"""
+Benchmarks for memograph's main stages on synthetic decks.
+
+    python3 -m benchmarks.run --sizes 1000 10000 100000 --output bench.json
+
+See `benchmarks.synth` for the deck generator and `benchmarks.run`
+for the timed stages.
+"""
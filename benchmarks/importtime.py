@@ -0,0 +1,154 @@
+"""
+Startup-time regression check: measure the cumulative import time of
+mg.main with `python -X importtime`, and check that modules only some
+subcommands need are not imported (and the media thread not started)
+at startup. Also time a whole `mg status` on a small synthetic deck
+(where startup is most of the cost), and check that it does without
+NumPy. Exits with status 1 if a check fails.
+
+    python3 -m benchmarks.importtime [--runs 5] [--limit MS]
+        [--status_limit MS]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.synth import generate
+
+
+# modules that should only be imported when first needed
+DEFERRED = [
+    "readline",             # only for subcommands reading input
+    "sqlite3",              # only for the sqlite backend
+    "numpy",                # only for batch scoring
+    "subprocess",           # only for media
+    "concurrent.futures",   # only for recompute
+    "mg.main.drill",
+    "mg.main.learn",
+    "mg.main.status",
+    "mg.main.info",
+    "mg.main.checkup",
+    "mg.main.recompute",
+    "mg.server",            # only for serve, or while a server runs
+]
+
+CHECK_SCRIPT = """
+import sys
+import mg.main
+import mg.media
+for name in sys.argv[1:]:
+    if name in sys.modules:
+        print("imported at startup:", name)
+if mg.media.md is not None:
+    print("media daemon started at startup")
+"""
+
+# size of the deck for timing `mg status` (like the tutorial's decks)
+STATUS_SIZE = 10
+
+# modules that a small deck's `mg status` should not need at all
+STATUS_UNNEEDED = [
+    "numpy",                # too slow to import for a few links
+]
+
+STATUS_SCRIPT = """
+import io
+import sys
+import contextlib
+from mg.main import main
+names = sys.argv[2:]
+sys.argv = ["mg", "status", "-g", sys.argv[1]]
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        main()
+finally:
+    for name in names:
+        if name in sys.modules:
+            print("imported by mg status:", name)
+"""
+
+
+def import_time(module="mg.main"):
+    """cumulative import time of `module` in a fresh interpreter (in µs)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    for line in result.stderr.splitlines():
+        # format: "import time: self [us] | cumulative | imported package"
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative)
+    raise ValueError(f"no import time reported for {module}")
+
+
+def deferred_violations():
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_SCRIPT, *DEFERRED],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    return result.stdout.splitlines()
+
+
+def status_time(graph_path):
+    """wall time of `mg status` for `graph_path` in a fresh process (in s)"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "mg", "status", "-g", graph_path],
+        capture_output=True, env=_env(), check=True,
+    )
+    return time.perf_counter() - start
+
+
+def status_violations(graph_path):
+    result = subprocess.run(
+        [sys.executable, "-c", STATUS_SCRIPT, graph_path, *STATUS_UNNEEDED],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    return result.stdout.splitlines()
+
+
+def _env():
+    # make sure the subprocesses import this copy of mg
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.environ.get("PYTHONPATH")
+    return {**os.environ, "PYTHONPATH": root + (os.pathsep + path if path else "")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('--runs', type=int, default=5,
+            help="number of measurements (the fastest is reported)")
+    parser.add_argument('--limit', type=float, default=None, metavar="MS",
+            help="fail if importing mg.main takes longer than this")
+    parser.add_argument('--status_limit', type=float, default=None,
+            metavar="MS",
+            help="fail if `mg status` on a small deck takes longer than this")
+    args = parser.parse_args()
+
+    failures = deferred_violations()
+    ms = min(import_time() for _ in range(args.runs)) / 1000
+    print(f"import mg.main: {ms:.1f}ms (fastest of {args.runs})")
+    if args.limit is not None and ms > args.limit:
+        failures.append(f"import time {ms:.1f}ms exceeds limit {args.limit}ms")
+
+    with tempfile.TemporaryDirectory() as path:
+        graph_path = generate(path, STATUS_SIZE)
+        failures += status_violations(graph_path) # (also warms the OS cache)
+        ms = min(status_time(graph_path) for _ in range(args.runs)) * 1000
+    print(f"mg status ({STATUS_SIZE} links): {ms:.1f}ms (fastest of {args.runs})")
+    if args.status_limit is not None and ms > args.status_limit:
+        failures.append(
+            f"mg status took {ms:.1f}ms, exceeding limit {args.status_limit}ms"
+        )
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
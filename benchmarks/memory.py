@@ -0,0 +1,83 @@
+"""
+Memory-footprint check: measure the memory held per link by a loaded
+synthetic deck (its GraphIndex, KeyTable, Database and KnowledgeGraph),
+with tracemalloc. Exits with status 1 if the total exceeds the limit.
+
+    python3 -m benchmarks.memory [--size 500000] [--limit BYTES]
+"""
+
+import os
+import gc
+import sys
+import argparse
+import tempfile
+import tracemalloc
+
+from mg.graph import KnowledgeGraph
+from mg.data import Database, Log, KeyTable, load_graph
+
+from benchmarks.synth import generate
+
+
+SIZE = 500_000
+
+
+def measure_deck(path, size):
+    """
+    Generate a deck with `size` links under `path`, and load it stage by
+    stage, generating (stage, bytes retained per link) pairs.
+    """
+    graph_path = generate(path, size)
+    data_path = os.path.join(path, "graph.mg")
+    stages = {}
+    def retained(stage, function):
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        stages[stage] = function()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        return stage, (after - before) / size
+
+    tracemalloc.start()
+    try:
+        yield retained("GraphIndex", lambda: load_graph(graph_path))
+        yield retained("KeyTable", lambda: KeyTable(
+            os.path.join(data_path, "keys.jsonl"),
+        ))
+        keys = stages["KeyTable"]
+        yield retained("Database", lambda: Database(
+            os.path.join(data_path, "data.json"),
+            keys,
+        ))
+        log = Log(os.path.join(data_path, "log.jsonl"), keys)
+        yield retained("KnowledgeGraph", lambda: KnowledgeGraph(
+            stages["GraphIndex"],
+            stages["Database"],
+            log,
+            keys,
+        ))
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('--size', type=int, default=SIZE,
+            help=f"deck size in links (default: {SIZE})")
+    parser.add_argument('--limit', type=float, default=None, metavar="BYTES",
+            help="fail if the deck takes more than this many bytes per link")
+    args = parser.parse_args()
+
+    total = 0
+    with tempfile.TemporaryDirectory() as path:
+        for stage, per_link in measure_deck(path, args.size):
+            total += per_link
+            print(f"{stage:<16} {per_link:8.1f} bytes/link")
+    print(f"{'total':<16} {total:8.1f} bytes/link ({args.size} links)")
+    if args.limit is not None and total > args.limit:
+        print(f"FAIL: {total:.1f} bytes/link exceeds limit {args.limit}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Time memograph's main stages on synthetic decks of several sizes, and
+write the results as JSON (for tracking regressions across versions).
+
+    python3 -m benchmarks.run [--sizes 1000 10000 ...] [--output PATH]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+
+import mg.webisu as webisu
+from mg.options import VERSION
+from mg.graph import KnowledgeGraph
+from mg.data import Database, Log, KeyTable, load_graph
+from mg.main.status import plot_histogram, plot_list, plot_tree
+
+from benchmarks.synth import generate
+
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def bench_deck(path, size, repeats):
+    """
+    Generate a deck with `size` links under `path` and time each stage,
+    generating (stage, seconds) pairs.
+    """
+    graph_path = generate(path, size)
+    data_path = os.path.join(path, "graph.mg")
+    db_path = os.path.join(data_path, "data.json")
+    log_path = os.path.join(data_path, "log.jsonl")
+    cache_path = os.path.join(data_path, "graph.cache")
+    keys = KeyTable(os.path.join(data_path, "keys.jsonl"))
+
+    def timed(stage, function):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = function()
+            yield stage, time.perf_counter() - start
+        stages[stage] = result
+
+    stages = {}
+    yield from timed("load_graph", lambda: load_graph(graph_path))
+    load_graph(graph_path, cache_path)
+    yield from timed("load_graph (cached)",
+            lambda: load_graph(graph_path, cache_path))
+    yield from timed("Database load", lambda: Database(db_path, keys))
+    db = stages["Database load"]
+    log = Log(os.path.join(path, "scratch.jsonl"), keys)
+    index = stages["load_graph"]
+    yield from timed("KnowledgeGraph.__init__",
+            lambda: KnowledgeGraph(index, db, log, keys))
+    graph = stages["KnowledgeGraph.__init__"]
+    yield from timed("query (learn)",
+            lambda: graph.query(number=6, new=True))
+    yield from timed("query (drill)",
+            lambda: graph.query(number=6))
+    yield from timed("query (review)",
+            lambda: graph.query(number=6, review=True))
+    graph.index_due()
+    yield from timed("query (drill, indexed)",
+            lambda: graph.query(number=6))
+    yield from timed("status --histogram",
+            lambda: _quietly(plot_histogram, graph, []))
+    yield from timed("status --list",
+            lambda: _quietly(plot_list, graph, []))
+    yield from timed("status --tree",
+            lambda: _quietly(plot_tree, graph, []))
+    hand = graph.query(number=6)
+    def drill_and_save():
+        for link in hand:
+            link.m.update(True)
+        db.save()
+    db.path = os.path.join(path, "scratch.json")
+    yield from timed("drill 6 and save", drill_and_save)
+    db.journal = True
+    db.journal_limit = float('inf')
+    yield from timed("drill 6 and save (journal)", drill_and_save)
+    yield from timed("Log history",
+            lambda: Log(log_path, keys).history(graph.links[0].m.id))
+
+
+def bench_update(n, repeats):
+    """
+    Time n calls to update_model_bernoulli, generating (stage, seconds)
+    pairs.
+    """
+    rng = random.Random(0)
+    trials = [
+        (rng.random() < 0.7, rng.uniform(60, 1e6), (1.0, 1.0, rng.uniform(60, 1e6)))
+        for _ in range(n)
+    ]
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for r, t, θ in trials:
+            webisu.update_model_bernoulli(r, t, θ)
+        yield f"update_model_bernoulli x{n}", time.perf_counter() - start
+
+
+def _quietly(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('--sizes', type=int, nargs="+", default=SIZES,
+            help=f"deck sizes in links (default: {SIZES})")
+    parser.add_argument('--repeats', type=int, default=3,
+            help="repetitions of each timed stage (default: 3)")
+    parser.add_argument('--output', default=None,
+            help="path for JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    timings = {}
+    def record(size, pairs):
+        for stage, seconds in pairs:
+            timings.setdefault((size, stage), []).append(seconds)
+            print(f"{size or '':>9} {stage:<28} {seconds:.4f}s", file=sys.stderr)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            record(size, bench_deck(path, size, args.repeats))
+    record(None, bench_update(10_000, args.repeats))
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    results = {
+        'mg_version': VERSION,
+        'python': platform.python_version(),
+        'numpy': numpy_version,
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'repeats': args.repeats,
+        'results': [
+            {
+                'size': size,
+                'stage': stage,
+                'min': min(seconds),
+                'median': statistics.median(seconds),
+                'all': seconds, # the first run includes warm-up costs
+            }
+            for (size, stage), seconds in timings.items()
+        ],
+    }
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
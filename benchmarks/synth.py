@@ -0,0 +1,125 @@
+"""
+Generate synthetic decks: a graph.py script with dotted topics and some
+repeated node labels, and a matching data.json and log.jsonl with a
+simulated review history for a fraction of the links.
+
+    python3 -m benchmarks.synth PATH --size 10000 [--seed 0]
+"""
+
+import os
+import json
+import time as timelib
+import random
+import argparse
+
+import mg.webisu as webisu
+from mg.data import KeyTable
+from mg.main.recompute import replay
+
+
+GRAPH_TEMPLATE = '''\
+import random
+
+SIZE = {size}
+SEED = {seed}
+LANGS = ["de", "fr", "es", "it", "ja"]
+PARTS = ["nouns", "verbs", "adjectives", "adverbs", "phrases", "numbers"]
+LEVELS = ["a1", "a2", "b1", "b2"]
+
+def graph():
+    rng = random.Random(SEED)
+    for i in range(SIZE):
+        topic = ".".join([
+            LANGS[i % len(LANGS)],
+            rng.choice(PARTS),
+            rng.choice(LEVELS),
+        ])
+        # a few prompts are shared between cards (to exercise numbering)
+        u = f"word{{rng.randrange(i+1) if rng.random() < 0.02 else i}}"
+        v = f"{{topic}}:{{i}}"
+        yield u, v, topic
+'''
+
+# fraction of links with a review history
+SEEN = 0.6
+# histories start up to a year before they end
+YEAR = 365 * 24 * 60 * 60
+
+
+def generate(path, size, seed=0, now=None):
+    """
+    Write a synthetic deck with `size` links to directory `path`, with
+    its data in `path`/graph.mg. Returns the path of the graph script.
+
+    Histories end at time `now` (default: the current time), so that
+    the deck's recall probabilities look like those of a deck in use.
+    Apart from this offset, the deck depends only on `size` and `seed`.
+    """
+    if now is None:
+        now = int(timelib.time())
+    os.makedirs(os.path.join(path, "graph.mg"), exist_ok=True)
+    graph_path = os.path.join(path, "graph.py")
+    with open(graph_path, 'w') as f:
+        f.write(GRAPH_TEMPLATE.format(size=size, seed=seed))
+
+    # simulate histories (keys follow mg.graph.GraphIndex's format, and
+    # are given IDs in graph order, as mg.graph.KnowledgeGraph would)
+    namespace = {}
+    exec(GRAPH_TEMPLATE.format(size=size, seed=seed), namespace)
+    rng = random.Random(seed)
+    keys = KeyTable(os.path.join(path, "graph.mg", "keys.jsonl"))
+    data = {}
+    events = []
+    for u, v, t in namespace['graph']():
+        id = keys.id(f"{u}-[{t}]-{v}")
+        if id in data or rng.random() > SEEN:
+            continue
+        history = simulate(id, rng, now)
+        events.extend(history)
+        data[id] = replay([(e['time'], e['event'], e['data']) for e in history])
+    events.sort(key=lambda e: e['time'])
+    keys.save()
+
+    with open(os.path.join(path, "graph.mg", "data.json"), 'w') as f:
+        json.dump(data, f, indent=2)
+    with open(os.path.join(path, "graph.mg", "log.jsonl"), 'w') as f:
+        for event in events:
+            print(json.dumps(event), file=f)
+    return graph_path
+
+
+def simulate(id, rng, now):
+    """
+    Simulate a link's events: learned at a random time in the last
+    year, then drilled (or occasionally skipped) a few times, with a
+    result drawn from the model's expected recall.
+    """
+    time = now - rng.randrange(YEAR)
+    prior = rng.choice([[1, 1, 60], [1, 1, 60*60], [1, 1, 2*24*60*60]])
+    events = [_event(id, time, "LEARN", prior=prior)]
+    θ = prior
+    for _ in range(rng.randrange(8)):
+        t = int(θ[2] * rng.uniform(0.2, 3)) + 1
+        if time + t >= now:
+            break
+        time += t
+        if rng.random() < 0.05:
+            events.append(_event(id, time, "REVIEW"))
+            continue
+        got = rng.random() < webisu.p_recall_t_mean(t, θ)
+        θ = webisu.update_model_bernoulli(got, t, θ)
+        events.append(_event(id, time, "DRILL", got=got))
+    return events
+
+
+def _event(id, time, event, **data):
+    return {'id': id, 'time': time, 'event': event, 'data': data}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('path')
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.path, args.size, args.seed)
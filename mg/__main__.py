@@ -1,9 +1,5 @@
 from mg.main import main
 
 if __name__ == "__main__":
-    # setup readline (disable history)
-    import readline
-    readline.set_auto_history(False)
-    
-    # launch app
+    # launch app (readline is set up on first input, see mg.mgio)
     main()
@@ -0,0 +1,76 @@
+"""
+Compact sets of small non-negative integers (e.g. link ordinals),
+stored as bitmaps in a bytearray.
+
+Membership tests and updates touch a single byte, while intersection
+and counting convert the whole bitmap to a Python int so that they run
+word-parallel inside the interpreter.
+"""
+
+import functools
+
+
+# positions of the set bits in each byte value
+_BITS = [tuple(b for b in range(8) if x >> b & 1) for x in range(256)]
+
+
+class Bitset:
+    def __init__(self, items=(), size=0):
+        self.bytes = bytearray((size + 7) // 8)
+        for i in items:
+            self.add(i)
+
+    @classmethod
+    def from_int(cls, x):
+        bitset = cls()
+        bitset.bytes = bytearray(x.to_bytes((x.bit_length() + 7) // 8, 'little'))
+        return bitset
+
+    def to_int(self):
+        return int.from_bytes(self.bytes, 'little')
+
+    def add(self, i):
+        j = i >> 3
+        if j >= len(self.bytes):
+            self.bytes.extend(bytes(j + 1 - len(self.bytes)))
+        self.bytes[j] |= 1 << (i & 7)
+
+    def discard(self, i):
+        j = i >> 3
+        if j < len(self.bytes):
+            self.bytes[j] &= ~(1 << (i & 7))
+
+    def __contains__(self, i):
+        j = i >> 3
+        return j < len(self.bytes) and bool(self.bytes[j] >> (i & 7) & 1)
+
+    def __iter__(self):
+        """generate members in increasing order"""
+        for j, x in enumerate(self.bytes):
+            if x:
+                for b in _BITS[x]:
+                    yield 8*j + b
+
+    def __len__(self):
+        return bin(self.to_int()).count("1")
+
+    def __and__(self, other):
+        return Bitset.from_int(self.to_int() & other.to_int())
+
+    def __or__(self, other):
+        return Bitset.from_int(self.to_int() | other.to_int())
+
+    def __repr__(self):
+        return f"Bitset({list(self)})"
+
+    @staticmethod
+    def intersection(*bitsets):
+        """intersect any number of bitsets (with a single conversion)"""
+        x = functools.reduce(int.__and__, (b.to_int() for b in bitsets))
+        return Bitset.from_int(x)
+
+    @staticmethod
+    def union(*bitsets):
+        """unite any number of bitsets (with a single conversion)"""
+        x = functools.reduce(int.__or__, (b.to_int() for b in bitsets), 0)
+        return Bitset.from_int(x)
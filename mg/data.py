@@ -1,44 +1,598 @@
+import io
 import os
+import sys
 import json
+import math
+import time
+import queue
 import runpy
+import pickle
+import struct
+import hashlib
+import builtins
+import threading
+import contextlib
+from array import array
+from operator import itemgetter
 
+from mg.graph import GraphIndex
+from mg.webisu import Model
+from mg.profile import timed
+from mg.options import VERSION
 
-def load_graph(source_path):
-    if os.path.lexists(source_path):
-        return runpy.run_path(source_path)['graph']()
-    else:
+
+# bump whenever the pickled GraphIndex changes shape
+GRAPH_CACHE_FORMAT = 3
+
+
+@timed
+def load_graph(source_path, cache_path=None):
+    """
+    Run the graph script at `source_path` and index the links it yields.
+
+    If `cache_path` is given, the resulting GraphIndex is cached there,
+    along with hashes of the script, of the modules it imported and the
+    files and directory listings it read while generating links, and the
+    mg version. While these are all unchanged, later loads return the
+    cached index without running the script. (Other inputs, such as the
+    time, environment variables, or the network, are not tracked.)
+    """
+    if not os.path.lexists(source_path):
         raise Exception(f"No such graph file {source_path!r}")
+    if cache_path is not None:
+        index = _load_cached_graph(source_path, cache_path)
+        if index is not None:
+            return index
+    with _recording_dependencies() as dependencies:
+        index = GraphIndex(runpy.run_path(source_path)['graph']())
+    if cache_path is not None:
+        _save_cached_graph(source_path, cache_path, dependencies, index)
+    return index
+
+
+def _load_cached_graph(source_path, cache_path):
+    if not os.path.lexists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    except Exception:
+        return None # stale or corrupt, start again
+    if cache.get('format') != GRAPH_CACHE_FORMAT or cache['version'] != VERSION:
+        return None
+    for path, digest in [(source_path, cache['source']), *cache['deps']]:
+        if _hash_path(path) != digest:
+            return None
+    return cache['index']
+
+
+def cached_dependencies(cache_path):
+    """
+    The paths of the files (other than the script itself) which the
+    graph cached at `cache_path` was generated from, if any.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            return [path for path, _digest in pickle.load(f)['deps']]
+    except Exception:
+        return []
+
+
+def _save_cached_graph(source_path, cache_path, dependencies, index):
+    cache = {
+        'format': GRAPH_CACHE_FORMAT,
+        'version': VERSION,
+        'source': _hash_path(source_path),
+        'deps': [(path, _hash_path(path)) for path in sorted(dependencies)],
+        'index': index,
+    }
+    try:
+        data = pickle.dumps(cache, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return # e.g. custom node classes defined in the script itself
+    _ensure(cache_path)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, cache_path)
+
+
+def _hash_path(path):
+    """a hash of the contents of a file, or of the listing of a directory"""
+    try:
+        if os.path.isdir(path):
+            listing = "\n".join(sorted(os.listdir(path))).encode()
+            return hashlib.sha256(listing).hexdigest()
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def _recording_dependencies():
+    """
+    Collect the paths of the modules imported (including those imported
+    earlier, e.g. by a previous run in the same process), the files
+    opened for reading, and the directories listed within the context.
+    """
+    paths = set()
+    modules = set()
+    real_open = builtins.open
+    real_import = builtins.__import__
+    real_listdir = os.listdir
+    real_scandir = os.scandir
+    def recording_open(file, mode='r', *args, **kwargs):
+        if isinstance(file, (str, os.PathLike)) and set(mode).isdisjoint("wax+"):
+            paths.add(os.path.abspath(file))
+        return real_open(file, mode, *args, **kwargs)
+    def recording_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = real_import(name, globals, locals, fromlist, level)
+        modules.add(module)
+        if level == 0:
+            modules.add(sys.modules.get(name))  # e.g. a.b for `import a.b`
+        for attr in fromlist or ():
+            modules.add(getattr(module, attr, None))
+        return module
+    def recording_listdir(path='.'):
+        if isinstance(path, (str, os.PathLike)):
+            paths.add(os.path.abspath(path))
+        return real_listdir(path)
+    def recording_scandir(path='.'):
+        if isinstance(path, (str, os.PathLike)):
+            paths.add(os.path.abspath(path))
+        return real_scandir(path)
+    before = set(sys.modules)
+    builtins.open = io.open = recording_open
+    builtins.__import__ = recording_import
+    os.listdir = recording_listdir
+    os.scandir = recording_scandir
+    try:
+        yield paths
+    finally:
+        builtins.open = io.open = real_open
+        builtins.__import__ = real_import
+        os.listdir = real_listdir
+        os.scandir = real_scandir
+        modules.update(sys.modules[name] for name in set(sys.modules) - before)
+        for module in modules:
+            path = getattr(module, '__file__', None)
+            if isinstance(path, str):
+                paths.add(os.path.abspath(path))
 
 
-class Database(dict):
+class KeyTable:
+    """
+    A persistent table giving each link key (see `mg.graph.GraphIndex`)
+    a stable integer ID, by which the link's model and events are
+    stored, so that the (long) key is stored just once. IDs are assigned
+    in order as keys are first seen, and never reassigned or reused.
+
+    Stored as a journal of [id, key] records, one per line, appended as
+    IDs are assigned (see `save`).
+    """
     def __init__(self, path):
-        super().__init__()
         self.path = path
+        self.keys = []                  # id -> key
+        self.ids = {}                   # key -> id
+        self.saved = 0                  # ids [0, saved) are stored
+        self._load()
+        self.saved = len(self.keys)
+
+    def _load(self):
+        if os.path.lexists(self.path):
+            for id, key in _read_journal(self.path):
+                self._add(id, key)
+
+    def _add(self, id, key):
+        if id != len(self.keys):
+            raise ValueError(f"key table out of order at ID {id}")
+        self.keys.append(key)
+        self.ids[key] = id
+
+    def id(self, key):
+        """the ID of link `key`, assigning the next ID if it has none"""
+        try:
+            return self.ids[key]
+        except KeyError:
+            id = len(self.keys)
+            self._add(id, key)
+            return id
+
+    def find(self, key):
+        """the ID of link `key`, or None if it has none"""
+        return self.ids.get(key)
+
+    def key(self, id):
+        """the link key with ID `id`"""
+        return self.keys[id]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def is_new(self):
+        """whether no IDs have been stored yet"""
+        return not os.path.lexists(self.path)
+
+    def save(self):
+        """store any newly assigned IDs"""
+        if self.saved == len(self.keys) and not self.is_new():
+            return
+        _ensure(self.path)
+        with open(self.path, 'a') as f:
+            for id in range(self.saved, len(self.keys)):
+                print(json.dumps([id, self.keys[id]]), file=f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.saved = len(self.keys)
+
+
+def _link_id(key, keys):
+    """
+    The ID of a stored link: stored as an int (or a string of digits,
+    as a JSON object key), or by the link key itself in data stored
+    before link IDs (see `convert_keys`), in which case the ID is found
+    (or assigned) in the KeyTable `keys`. Link keys are never all
+    digits, since they contain "-[".
+    """
+    if isinstance(key, int):
+        return key
+    if key.isdigit():
+        return int(key)
+    return keys.id(key)
+
+
+class Database:
+    """
+    Memory model data for each link, stored column-wise: each field of
+    each model is kept in a contiguous array, indexed by the link's row
+    ordinal (see `row`). Links are identified by their IDs in the
+    KeyTable `keys`. Stored on disk in the same format as a dict
+    mapping each link ID to a dict with keys 'priorParams' (the α, β,
+    λ triple), 'numDrills', 'lastTime' and (optionally) 'lastResult'
+    and 'dueTime' (when recall is next expected to fall below the due
+    threshold, see `mg.graph`). Entries may also store the model's
+    normalising constants 'lnGammaRatio' and 'lnBeta' (see
+    `mg.webisu.Model`), which are otherwise computed on first use.
+
+    Storage is sparse: links whose models are yet to be initialised
+    have no row (see `find`) and no entry in the snapshot. An empty
+    dict entry in the journal marks a model which is no longer
+    initialised (e.g. after `mg recompute`), and empty entries in older
+    snapshots are skipped.
+
+    In journal mode, `save` appends just the changed ('dirty') entries
+    to a journal file alongside the snapshot, and only rewrites the
+    snapshot once the journal grows past `journal_limit` bytes. Loading
+    always replays any journal over the snapshot. Snapshots are written
+    to a temporary file and atomically renamed into place.
+
+    Each snapshot stores its 'generation' (counting snapshots), and each
+    journal begins with a header record (with key null) giving the
+    generation of the snapshot it follows. A journal older than the
+    snapshot was already included in it (the process stopped between
+    replacing the snapshot and removing the journal), so it is removed
+    rather than replayed. Writes to the files are serialised by `lock`
+    (they may come from an autosave thread, see Autosaver).
+    """
+    # num_drills value for models yet to be initialised
+    NEW = -1
+    # last_result value for models never drilled
+    UNKNOWN = -1
+
+    @timed
+    def __init__(self, path, keys, journal=False, journal_limit=1<<20):
+        self.path = path
+        self.key_table = keys
+        self.journal = journal
+        self.journal_path = path + ".journal"
+        self.journal_limit = journal_limit
+        self.dirty = set()              # rows changed since last save
+        self.generation = 0             # of the snapshot (see above)
+        self.lock = threading.Lock()    # held while writing files
+        self.index = {}                 # link ID -> row
+        self.row_keys = []              # row -> link ID
+        self.alpha = array('d')
+        self.beta = array('d')
+        self.halflife = array('d')
+        self.last_time = array('q')
+        self.num_drills = array('l')
+        self.last_result = array('b')
+        self.due_time = array('d')      # nan: not yet computed
+        self.ln_gamma_ratio = array('d')# nan: not yet computed
+        self.ln_beta = array('d')       # nan: not yet computed
+        self._load()
+
+    def _load(self):
         if os.path.lexists(self.path):
             with open(self.path, 'r') as f:
-                self.update(json.load(f))
+                data = json.load(f)
+            self.generation = data.pop('generation', 0)
+            for key, entry in data.items():
+                self._load_entry(key, entry)
+        if os.path.lexists(self.journal_path):
+            records = _read_journal(self.journal_path)
+            for key, entry in records:
+                if key is not None:
+                    self._load_entry(key, entry)
+                elif entry['generation'] < self.generation:
+                    # (already included in the snapshot)
+                    records.close()
+                    os.remove(self.journal_path)
+                    break
+
+    def _load_entry(self, key, entry):
+        key = _link_id(key, self.key_table)
+        if entry or key in self.index:
+            self.set_entry(self.row(key), entry)
+
+    def find(self, key):
+        """
+        Find the row for link ID `key`, or None if the ID is not stored
+        (its model is yet to be initialised).
+        """
+        return self.index.get(key)
+
+    def row(self, key):
+        """
+        Find the row for link ID `key`, allocating an empty row (for a
+        model yet to be initialised) if the ID is not yet stored.
+        """
+        try:
+            return self.index[key]
+        except KeyError:
+            i = len(self.row_keys)
+            self.index[key] = i
+            self.row_keys.append(key)
+            self.alpha.append(0.0)
+            self.beta.append(0.0)
+            self.halflife.append(0.0)
+            self.last_time.append(0)
+            self.num_drills.append(self.NEW)
+            self.last_result.append(self.UNKNOWN)
+            self.due_time.append(math.nan)
+            self.ln_gamma_ratio.append(math.nan)
+            self.ln_beta.append(math.nan)
+            return i
+
+    def keys(self):
+        return list(self.row_keys)
+
+    def __len__(self):
+        return len(self.row_keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def touch(self, i):
+        """
+        Mark row i as changed (to be written on next save).
+        """
+        self.dirty.add(i)
+
+    def get_params(self, i):
+        return (self.alpha[i], self.beta[i], self.halflife[i])
+
+    def set_params(self, i, θ):
+        self.alpha[i], self.beta[i], self.halflife[i] = θ
+        if isinstance(θ, Model):
+            self.ln_gamma_ratio[i] = θ.ln_gamma_ratio
+            self.ln_beta[i] = θ.ln_beta
+        else:
+            self.ln_gamma_ratio[i] = math.nan
+            self.ln_beta[i] = math.nan
+
+    def get_model(self, i):
+        """
+        The parameters of row i as a Model, with its normalising
+        constants (computed and stored if not yet known).
+        """
+        ln_gamma_ratio = self.ln_gamma_ratio[i]
+        ln_beta = self.ln_beta[i]
+        if math.isnan(ln_gamma_ratio) or math.isnan(ln_beta):
+            θ = Model(self.alpha[i], self.beta[i], self.halflife[i])
+            self.ln_gamma_ratio[i] = θ.ln_gamma_ratio
+            self.ln_beta[i] = θ.ln_beta
+            return θ
+        return Model(self.alpha[i], self.beta[i], self.halflife[i],
+                ln_gamma_ratio, ln_beta)
+
+    def gather(self, rows):
+        """
+        Collect the parameter columns (an (α, β, λ) triple of tuples)
+        and last review times (a tuple) for a sequence of rows.
+        """
+        rows = list(rows)
+        if len(rows) == 0:
+            return ((), (), ()), ()
+        if len(rows) == 1:
+            i, = rows
+            return ((self.alpha[i],), (self.beta[i],), (self.halflife[i],)), \
+                    (self.last_time[i],)
+        get = itemgetter(*rows)
+        return (get(self.alpha), get(self.beta), get(self.halflife)), \
+                get(self.last_time)
+
+    def gather_ln_gamma_ratio(self, rows):
+        """
+        Collect the ln Γ(α+β) - ln Γ(α) constants of a sequence of rows
+        (a list, see `get_model`).
+        """
+        column = self.ln_gamma_ratio
+        ratios = []
+        for i in rows:
+            c = column[i]
+            if math.isnan(c):
+                c = self.get_model(i).ln_gamma_ratio
+            ratios.append(c)
+        return ratios
+
+    def entry(self, i):
+        """
+        Build the data.json-format dict for row i.
+        """
+        if self.num_drills[i] == self.NEW:
+            return {}
+        entry = {
+            'priorParams': list(self.get_params(i)),
+            'numDrills': self.num_drills[i],
+            'lastTime': self.last_time[i],
+        }
+        if self.last_result[i] != self.UNKNOWN:
+            entry['lastResult'] = bool(self.last_result[i])
+        if not math.isnan(self.due_time[i]):
+            entry['dueTime'] = self.due_time[i]
+        if not math.isnan(self.ln_gamma_ratio[i]):
+            entry['lnGammaRatio'] = self.ln_gamma_ratio[i]
+            entry['lnBeta'] = self.ln_beta[i]
+        return entry
+
+    def set_entry(self, i, entry):
+        """
+        Overwrite row i from a data.json-format dict.
+        """
+        if 'priorParams' not in entry:
+            self.num_drills[i] = self.NEW
+            self.last_result[i] = self.UNKNOWN
+            self.due_time[i] = math.nan
+            return
+        self.set_params(i, entry['priorParams'])
+        if 'lnGammaRatio' in entry and 'lnBeta' in entry:
+            self.ln_gamma_ratio[i] = entry['lnGammaRatio']
+            self.ln_beta[i] = entry['lnBeta']
+        self.num_drills[i] = entry.get('numDrills', 0)
+        self.last_time[i] = entry['lastTime']
+        if 'lastResult' in entry:
+            self.last_result[i] = entry['lastResult']
+        else:
+            self.last_result[i] = self.UNKNOWN
+        self.due_time[i] = entry.get('dueTime', math.nan)
+
+    def values(self, i):
+        """
+        The column values of (initialised) row i, as stored by
+        SQLiteDatabase (with None for unknown values).
+        """
+        last_result = self.last_result[i]
+        due_time = self.due_time[i]
+        return (
+            *self.get_params(i),
+            self.last_time[i],
+            self.num_drills[i],
+            None if last_result == self.UNKNOWN else last_result,
+            None if math.isnan(due_time) else due_time,
+        )
+
+    def set_values(self, i, α, β, λ, last_time, num_drills, last_result,
+            due_time):
+        """
+        Overwrite row i from column values (see `values`).
+        """
+        self.set_params(i, (α, β, λ))
+        self.last_time[i] = last_time
+        self.num_drills[i] = num_drills
+        self.last_result[i] = self.UNKNOWN if last_result is None \
+                else last_result
+        self.due_time[i] = math.nan if due_time is None else due_time
+
+    @timed
     def save(self):
         _ensure(self.path)
-        with open(self.path, 'w') as f:
-            json.dump(self, f, indent=2)
-    def __missing__(self, key):
-        empty = {}
-        self[key] = empty
-        return empty
+        if self.journal:
+            self.write_changes(self.changes())
+            if os.path.getsize(self.journal_path) <= self.journal_limit:
+                return
+        self._save_snapshot()
+
+    def changes(self):
+        """
+        Collect the entries of the changed rows (which are then no
+        longer marked as changed), for `write_changes`.
+        """
+        records = [[self.row_keys[i], self.entry(i)] for i in sorted(self.dirty)]
+        self.dirty.clear()
+        return records
+
+    def write_changes(self, records):
+        """
+        Append entries collected by `changes` to the journal (whether or
+        not in journal mode: the next snapshot replaces the journal).
+        Needs no access to the columns, so may run on another thread.
+        """
+        _ensure(self.journal_path)
+        with self.lock, open(self.journal_path, 'a') as f:
+            if f.tell() == 0:
+                header = [None, {'generation': self.generation}]
+                print(json.dumps(header), file=f)
+            for record in records:
+                print(json.dumps(record), file=f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _save_snapshot(self):
+        data = {
+            key: self.entry(i)
+            for i, key in enumerate(self.row_keys)
+            if self.num_drills[i] != self.NEW
+        }
+        with self.lock:
+            data['generation'] = self.generation + 1
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            # the snapshot now includes everything in the journal (which
+            # is skipped on loading, should this process stop right here)
+            self.generation += 1
+            if os.path.lexists(self.journal_path):
+                os.remove(self.journal_path)
+        self.dirty.clear()
 
 
 class Log:
-    def __init__(self, path, load=False):
+    """
+    An append-only log of memory model events, stored one JSON object
+    per line, each with the 'id' of its link (see KeyTable). The log is
+    never loaded all at once: `lines` streams it, and `ids` and
+    `history` use a sidecar index (the log path plus ".idx") of the
+    link ID and byte offset of each event, as fixed-width binary
+    records (see _OFFSET). The index is appended to whenever the log
+    has grown since it was last indexed (and rebuilt if it no longer
+    matches the log, e.g. if the log was replaced).
+    """
+    def __init__(self, path, keys):
         self.path = path
-        self.load = load
+        self.key_table = keys
+        self.index_path = path + ".idx"
         self.new_lines = []
-        if self.load:
-            with open(self.path, 'r') as file:
-                self.old_lines = [json.loads(line) for line in file]
-        else:
-            self.old_lines = []
+        self._offsets = None
+        self._size = 0
+    def _read(self):
+        if os.path.lexists(self.path):
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    line = json.loads(line)
+                    line['id'] = _link_id(line['id'], self.key_table)
+                    yield line
     def lines(self):
-        return self.old_lines + self.new_lines
+        """generate all logged events, saved and unsaved"""
+        yield from self._read()
+        yield from self.new_lines
+    def ids(self):
+        """the set of link IDs with logged events"""
+        return set(self._index()) | {l['id'] for l in self.new_lines}
+    def history(self, id):
+        """the logged events for the link with ID `id`"""
+        offsets = self._index().get(id, [])
+        lines = []
+        if offsets:
+            with open(self.path, 'rb') as file:
+                for offset in offsets:
+                    file.seek(offset)
+                    lines.append(json.loads(file.readline()))
+        return lines + [l for l in self.new_lines if l['id'] == id]
     def log(self, id, time, event, data):
         self.new_lines.append({
             'id': id,
@@ -46,11 +600,401 @@ class Log:
             'event': event,
             'data': data,
         })
+    @timed
     def save(self):
+        self.write_changes(self.changes())
+    def changes(self):
+        """
+        Collect the events logged since the last save (which are then no
+        longer pending), for `write_changes`.
+        """
+        lines, self.new_lines = self.new_lines, []
+        return lines
+    def write_changes(self, lines):
+        """
+        Append events collected by `changes` to the log (may run on
+        another thread).
+        """
         _ensure(self.path)
         with open(self.path, 'a') as file:
-            for line in self.new_lines:
+            for line in lines:
                 print(json.dumps(line), file=file)
+            file.flush()
+            os.fsync(file.fileno())
+    def _index(self):
+        """
+        load the offset index, bringing it up to date with the log (by
+        appending the offsets of any new events)
+        """
+        log_size = self._log_size()
+        if self._offsets is not None and self._size == log_size:
+            return self._offsets
+        offsets, size = self._load_index(log_size)
+        if size < log_size:
+            records = []
+            with open(self.path, 'rb') as file:
+                file.seek(size)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break # partial line, being written
+                    id = _link_id(json.loads(line)['id'], self.key_table)
+                    offsets.setdefault(id, []).append(size)
+                    records.append(_OFFSET.pack(id, size))
+                    size += len(line)
+            with open(self.index_path, 'ab') as f:
+                f.write(b"".join(records))
+        self._offsets, self._size = offsets, size
+        return offsets
+    def _load_index(self, log_size):
+        """
+        read the offset index, returning the offsets of each link ID's
+        events, and the size of the log they cover (the index is removed
+        if it doesn't match the log, to be rebuilt)
+        """
+        if not os.path.lexists(self.index_path):
+            return {}, 0
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        if not data:
+            return {}, 0
+        offsets = {}
+        if len(data) % _OFFSET.size == 0:
+            for id, offset in _OFFSET.iter_unpack(data):
+                offsets.setdefault(id, []).append(offset)
+            # check that the last event indexed is where the index says
+            line = b""
+            if offset < log_size:
+                with open(self.path, 'rb') as file:
+                    file.seek(offset)
+                    line = file.readline()
+            try:
+                if line.endswith(b"\n") and \
+                        _link_id(json.loads(line)['id'], self.key_table) == id:
+                    return offsets, offset + len(line)
+            except (ValueError, KeyError, TypeError):
+                pass # (not the start of an event)
+        os.remove(self.index_path)
+        return {}, 0
+    def _log_size(self):
+        if os.path.lexists(self.path):
+            return os.path.getsize(self.path)
+        return 0
+
+
+# log index records: link ID, byte offset of the event in the log
+_OFFSET = struct.Struct('<qq')
+
+
+# # #
+# SQLite storage
+#
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    id          INTEGER PRIMARY KEY,
+    key         TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS models (
+    id          INTEGER PRIMARY KEY,
+    alpha       REAL NOT NULL,
+    beta        REAL NOT NULL,
+    halflife    REAL NOT NULL,
+    last_time   INTEGER NOT NULL,
+    num_drills  INTEGER NOT NULL,
+    last_result INTEGER,
+    due_time    REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER NOT NULL,
+    time        INTEGER NOT NULL,
+    event       TEXT NOT NULL,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_id_time ON events (id, time);
+"""
+
+
+class SQLiteKeyTable(KeyTable):
+    """
+    A KeyTable stored in the 'keys' table of an SQLite file. Each save
+    writes the newly assigned IDs in a single transaction.
+    """
+    def __init__(self, path):
+        self.conn = _connect(path)
+        super().__init__(path)
+
+    def _load(self):
+        for id, key in self.conn.execute("SELECT id, key FROM keys ORDER BY id"):
+            self._add(id, key)
+
+    def is_new(self):
+        return False # (SQLite files have always stored link IDs)
+
+    def save(self):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO keys VALUES (?, ?)",
+                ((id, self.keys[id]) for id in range(self.saved, len(self.keys))),
+            )
+        self.saved = len(self.keys)
+
+
+class SQLiteDatabase(Database):
+    """
+    A Database stored in the 'models' table of an SQLite file (one row
+    per initialised model, keyed by link ID) instead of data.json.
+    Each save writes the changed models in a single transaction.
+    Normalising constants are not stored, but computed on first use.
+    """
+    def __init__(self, path, keys):
+        self.conn = _connect(path)
+        super().__init__(path, keys)
+
+    def _load(self):
+        for id, *values in self.conn.execute(
+                "SELECT id, alpha, beta, halflife, last_time, num_drills,"
+                " last_result, due_time FROM models"):
+            self.set_values(self.row(id), *values)
+
+    def keys(self):
+        return [id for id, in self.conn.execute("SELECT id FROM models")]
+
+    @timed
+    def save(self):
+        self.write_changes(self.changes())
+
+    def changes(self):
+        dirty = sorted(self.dirty)
+        self.dirty.clear()
+        return (
+            [(self.row_keys[i], *self.values(i))
+                for i in dirty if self.num_drills[i] != self.NEW],
+            [(self.row_keys[i],)
+                for i in dirty if self.num_drills[i] == self.NEW],
+        )
+
+    def write_changes(self, records):
+        upserts, deletes = records
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                upserts,
+            )
+            self.conn.executemany("DELETE FROM models WHERE id = ?", deletes)
+
+
+class SQLiteLog(Log):
+    """
+    A Log stored in the 'events' table of an SQLite file (indexed by
+    link ID and time) instead of log.jsonl. Each save writes the new
+    events in a single transaction.
+    """
+    def __init__(self, path, keys):
+        self.conn = _connect(path)
+        super().__init__(path, keys)
+
+    def _read(self):
+        for id, when, event, data in self.conn.execute(
+                "SELECT id, time, event, data FROM events ORDER BY rowid"):
+            yield {'id': id, 'time': when, 'event': event,
+                    'data': json.loads(data)}
+
+    def ids(self):
+        ids = {id for id, in self.conn.execute("SELECT DISTINCT id FROM events")}
+        return ids | {l['id'] for l in self.new_lines}
+
+    def history(self, id):
+        old_lines = [
+            {'id': id, 'time': when, 'event': event, 'data': json.loads(data)}
+            for when, event, data in self.conn.execute(
+                "SELECT time, event, data FROM events WHERE id = ?"
+                " ORDER BY time, rowid", (id,))
+        ]
+        return old_lines + [l for l in self.new_lines if l['id'] == id]
+
+    @timed
+    def save(self):
+        self.write_changes(self.changes())
+
+    def write_changes(self, lines):
+        self._insert(lines)
+
+    def _insert(self, lines):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?)",
+                ((l['id'], l['time'], l['event'], json.dumps(l['data']))
+                    for l in lines),
+            )
+
+
+def convert_to_sqlite(db_path, log_path, keys_path, sqlite_path):
+    """
+    Copy the memory models from a data.json file (and its journal, if
+    any), the events from a log.jsonl file and the link IDs from a key
+    table into a new SQLite file. The JSON files are left in place.
+    """
+    temp_path = sqlite_path + ".tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    json_keys = KeyTable(keys_path)
+    keys = SQLiteKeyTable(temp_path)
+    db = SQLiteDatabase(temp_path, keys)
+    json_db = Database(db_path, json_keys)
+    for i, id in enumerate(json_db.row_keys):
+        if json_db.num_drills[i] != json_db.NEW:
+            j = db.row(id)
+            db.set_values(j, *json_db.values(i))
+            db.touch(j)
+    db.save()
+    db.conn.close()
+    log = SQLiteLog(temp_path, keys)
+    log._insert(Log(log_path, json_keys)._read())
+    log.conn.close()
+    # (after reading the data, which may assign IDs to stored link keys)
+    for key in json_keys.keys:
+        keys.id(key)
+    keys.save()
+    keys.conn.close()
+    os.replace(temp_path, sqlite_path)
+
+
+def convert_keys(keys, db_path, log_path):
+    """
+    Convert a data.json file (and its journal, if any) and a log.jsonl
+    file stored by link key (from before link IDs) to store link IDs
+    instead, assigning them in the KeyTable `keys` in order of first
+    appearance. The key table is saved first, and then the data and the
+    log are each replaced atomically: since link keys are still read
+    correctly (see `_link_id`), the deck stays readable if the
+    conversion is interrupted part way.
+    """
+    db = Database(db_path, keys)
+    log = Log(log_path, keys)
+    temp_path = log_path + ".tmp"
+    if os.path.lexists(log_path):
+        with open(temp_path, 'w') as f:
+            for line in log._read():
+                print(json.dumps(line), file=f)
+            f.flush()
+            os.fsync(f.fileno())
+    keys.save()
+    if os.path.lexists(db_path) or os.path.lexists(db.journal_path):
+        db._save_snapshot()
+    if os.path.lexists(temp_path):
+        os.replace(temp_path, log_path)
+        if os.path.lexists(log.index_path):
+            os.remove(log.index_path)
+
+
+# # #
+# Autosave
+#
+
+class Autosaver:
+    """
+    Saves the changes to a Database and Log during a session: whenever
+    it is polled (see `poll`) after `every` events have been logged, or
+    `interval` seconds have passed, since the last autosave. Changes are
+    collected on the calling thread, and written in order on a
+    background thread, so that slow storage doesn't hold up the session.
+
+    The models are appended to the database journal (even when not in
+    journal mode), so each autosave writes only the changed models, and
+    a crash at any point leaves a consistent deck (see `_read_journal`).
+    `close` waits for the writes to finish, before a final save (which
+    may rewrite the snapshot): the journal is only ever written holding
+    the Database's lock, but the writes must also land in order.
+    """
+    def __init__(self, db, log, every=None, interval=None):
+        self.db = db
+        self.log = log
+        self.every = every
+        self.interval = interval
+        self.last_time = time.monotonic()
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.failed = [] # (changes, exception) pairs
+
+    def poll(self):
+        """autosave, if it is time"""
+        n = len(self.log.new_lines)
+        if n == 0 and not self.db.dirty:
+            return
+        if self.every and n >= self.every:
+            self.save()
+        elif self.interval and time.monotonic() - self.last_time >= self.interval:
+            self.save()
+
+    def save(self):
+        self.last_time = time.monotonic()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write, daemon=True)
+            self.thread.start()
+        self.queue.put((self.db.changes(), self.log.changes()))
+
+    def close(self):
+        """
+        wait for any autosaves to be written; changes which could not be
+        written are marked as unsaved again (for the next save)
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        for (records, lines), _exception in self.failed:
+            # (rewriting the models' current entries is enough)
+            self.db.dirty.update(self.db.index[key] for key in _keys(records))
+            self.log.new_lines[:0] = lines
+        self.failed.clear()
+
+    def _write(self):
+        while True:
+            changes = self.queue.get()
+            if changes is None:
+                return
+            records, lines = changes
+            try:
+                self.log.write_changes(lines)
+                lines = []
+                self.db.write_changes(records)
+            except Exception as e:
+                self.failed.append(((records, lines), e))
+
+
+def _keys(records):
+    # the keys of Database or SQLiteDatabase changes
+    if isinstance(records, tuple):
+        upserts, deletes = records
+        return [key for key, *_ in upserts + deletes]
+    return [key for key, _entry in records]
+
+
+def _connect(path):
+    import sqlite3 # only needed for this backend
+    _ensure(path)
+    # (saves may be written from an autosave thread, see Autosaver)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(SQLITE_SCHEMA)
+    return conn
+
+
+def _read_journal(path):
+    """
+    Generate the (key, entry) records from a database journal (or the
+    (id, key) records of a key table). A partial final record (e.g. from
+    a crash part-way through a write) is skipped and truncated away, so
+    that later records can be appended cleanly.
+    """
+    with open(path, 'rb+') as f:
+        end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                f.truncate(end)
+                break
+            key, entry = json.loads(line)
+            end += len(line)
+            yield key, entry
 
 
 def _ensure(path):
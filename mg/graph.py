@@ -1,47 +1,80 @@
+import sys
+import math
 import time
+import heapq
 import typing
 import itertools
 import collections
+from array import array
 
 import mg.webisu as webisu
 import mg.topk as topk
+import mg.profile as profile
 
 from mg.node import Node, load_node
+from mg.bitset import Bitset
 
 
 # # #
 # Bayesian Memory Model
 # 
 
+# A link is 'due' once its expected recall probability falls below this
+# threshold (see DueIndex). Changing it invalidates stored due times.
+DUE_RECALL = 0.5
+
+# Queries only use the DueIndex while at most this fraction of links are
+# due (beyond that, it's cheaper to score every link in one batch)
+DUE_INDEX_LIMIT = 1/16
+
+# Topic summaries predict recall as of a fixed time, moved to the
+# current time once this many seconds old (see KnowledgeGraph.summary)
+RECALL_REFRESH = 60*60
+
+
 class MemoryModel:
-    def __init__(self, key, database, log):
-        self.key = key
-        self.data = database[key] # modifiable reference
+    """
+    A view of the memory model for one link, backed by a row of the
+    (column-wise) database, which is allocated when the model is first
+    initialised (until then, row is None). Changes to the model are
+    passed on to the graph, if any, to keep its status index and topic
+    aggregates up to date (see KnowledgeGraph.restatus).
+    """
+    __slots__ = ('id', 'db', 'row', 'log', 'due_index', 'graph')
+
+    def __init__(self, id, database, log, due_index=None, graph=None):
+        self.id = id                    # link ID (see mg.data.KeyTable)
+        self.db = database
+        self.row = database.find(id)
         self.log = log
+        self.due_index = due_index
+        self.graph = graph
     
     def is_new(self):
         """
         bool: the memory model is yet to be initialised
         """
-        return self.data == {}
+        return self.row is None or self.db.num_drills[self.row] == self.db.NEW
 
     def is_recalled(self):
         """
         bool: the last trial with this link passed
         (false if failed *or* if never tried)
         """
-        if 'lastResult' in self.data:
-            return self.data['lastResult']
-        else:
-            return False
+        return self.db.last_result[self.row] == 1
 
     def init(self, prior_params=[1, 1, 1*60*60]):
         """
         set up the memory model for the first time
         """
-        self.data['priorParams'] = prior_params
-        self.data['numDrills'] = 0
-        self.data['lastTime'] = self._current_time()
+        if self.row is None:
+            self.row = self.db.row(self.id)
+        self.db.set_params(self.row, prior_params)
+        self.db.num_drills[self.row] = 0
+        self.db.last_time[self.row] = self._current_time()
+        self._schedule()
+        self.db.touch(self.row)
+        self._restatus()
         self._log("LEARN", prior=prior_params)
     
     def predict(self, exact=False):
@@ -49,8 +82,8 @@ class MemoryModel:
         compute the expected (log) probability of recalling the link
         (link must be initialised)
         """
-        elapsed_time = self._current_time() - self.data['lastTime']
-        prior_params = self.data['priorParams']
+        elapsed_time = self.elapsed()
+        prior_params = self.db.get_model(self.row)
         if exact:
             return webisu.p_recall_t_mean(t=elapsed_time, θ=prior_params)
         else:
@@ -61,13 +94,25 @@ class MemoryModel:
         compute the density of the probability of recalling the
         link (link must be initialised)
         """
-        elapsed_time = self._current_time() - self.data['lastTime']
-        prior_params = self.data['priorParams']
+        elapsed_time = self.elapsed()
+        prior_params = self.db.get_model(self.row)
         return webisu.p_recall_t_pdf(t=elapsed_time, θ=prior_params, p=prob)
 
+    def cumulative(self, prob):
+        """
+        compute the probability that the probability of recalling the
+        link is at most prob (link must be initialised)
+        """
+        elapsed_time = self.elapsed()
+        prior_params = self.db.get_model(self.row)
+        return webisu.p_recall_t_cdf(t=elapsed_time, θ=prior_params, p=prob)
+
     def review(self):
         """update time without updating memory model"""
-        self.data['lastTime'] = self._current_time()
+        self.db.last_time[self.row] = self._current_time()
+        self._schedule()
+        self.db.touch(self.row)
+        self._restatus()
         self._log("REVIEW")
 
     def update(self, got):
@@ -75,29 +120,61 @@ class MemoryModel:
         update the memory model based on the result of a drill
         note: must be initialised
         """
-        self.data['numDrills'] += 1
-        self.data['lastResult'] = got
+        self.db.num_drills[self.row] += 1
+        self.db.last_result[self.row] = got
         now = self._current_time()
-        prior_params = self.data['priorParams']
-        elapsed_time = now - self.data['lastTime']
+        prior_params = self.db.get_params(self.row)
+        elapsed_time = now - self.db.last_time[self.row]
         postr_params = webisu.update_model_bernoulli(
             r=got,
             t=elapsed_time,
             θ=prior_params,
         )
-        self.data['priorParams'] = postr_params
-        self.data['lastTime'] = now
+        self.db.set_params(self.row, postr_params)
+        self.db.last_time[self.row] = now
+        self._schedule()
+        self.db.touch(self.row)
+        self._restatus()
         self._log("DRILL", got=got)
 
     def elapsed(self):
-        return self._current_time() - self.data['lastTime']
+        return self._current_time() - self.db.last_time[self.row]
+
+    def due(self):
+        """
+        the time at which the expected probability of recalling the
+        link falls below DUE_RECALL (link must be initialised)
+        """
+        due = self.db.due_time[self.row]
+        if math.isnan(due):
+            due = self._schedule()
+        return due
+
+    def _schedule(self):
+        """
+        recompute the due time after a change to the model (a derived
+        value, so this doesn't mark the model's data as changed)
+        """
+        interval = webisu.t_recall_lnmean(
+            lnp=math.log(DUE_RECALL),
+            θ=self.db.get_model(self.row),
+        )
+        due = self.db.last_time[self.row] + interval
+        self.db.due_time[self.row] = due
+        if self.due_index is not None:
+            self.due_index.push(self.row, due)
+        return due
+
+    def _restatus(self):
+        if self.graph is not None:
+            self.graph.restatus(self.id)
 
     def _current_time(_self):
-        return int(time.time())
+        return _current_time()
 
     def _log(self, event, **data):
         self.log.log(
-            id=self.key,
+            id=self.id,
             time=self._current_time(),
             event=event,
             data=data,
@@ -105,13 +182,72 @@ class MemoryModel:
 
     def __str__(self):
         return "(α={:.3f}, β={:.3f}, λ={:.1f}s)".format(
-            *self.data['priorParams'],
-            self._current_time() - self.data['lastTime']
+            *self.db.get_params(self.row),
+            self.elapsed(),
         )
 
 
 
 
+def _current_time():
+    return int(time.time())
+
+
+# # #
+# Due-time index
+# 
+
+class DueIndex:
+    """
+    A heap of (due time, row) pairs for the initialised memory models
+    of a graph. Since expected recall decreases with elapsed time, the
+    links due by now are exactly those with expected recall below
+    DUE_RECALL, and they can be found without scoring the whole graph.
+
+    The heap is built on request (see KnowledgeGraph.index_due), since
+    building it only pays off for a graph serving many queries, and then
+    kept up to date as models are scheduled. Superseded entries are left
+    in the heap and skipped (the current due time of each row is tracked
+    separately).
+    """
+    def __init__(self):
+        self.heap = None
+        self.times = {}
+
+    def is_built(self):
+        return self.heap is not None
+
+    def build(self, items):
+        """build from an iterable of (row, due time) pairs"""
+        self.times = dict(items)
+        self.heap = [(due, row) for row, due in self.times.items()]
+        heapq.heapify(self.heap)
+
+    def push(self, row, due):
+        if self.heap is None:
+            return
+        self.times[row] = due
+        heapq.heappush(self.heap, (due, row))
+        if len(self.heap) > 2 * len(self.times) + 64:
+            self.build(self.times.items())
+
+    def overdue(self, now):
+        """
+        generate the rows due by time `now` (in no particular order)
+        """
+        # walk the heap tree, pruning subtrees rooted after `now`
+        heap = self.heap
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            due, row = heap[i]
+            if due > now:
+                continue
+            if self.times[row] == due:
+                yield row
+            stack.extend(j for j in (2*i+1, 2*i+2) if j < len(heap))
+
+
 # # #
 # Knowledge Graph Link
 # 
@@ -129,61 +265,349 @@ class Link(typing.NamedTuple):
         if self.m.is_new():
             return s
         else:
-            elapsed_time = self.m._current_time() - self.m.data['lastTime']
-            return f"{s} [{elapsed_time}s ago]"
+            return f"{s} [{self.m.elapsed()}s ago]"
 
 
 # # #
-# Knowledge Graph
+# Graph Index
 #
 
-class KnowledgeGraph:
-    def __init__(self, items, database, log):
-        # generate and load all nodes and links from this script
-        unodes = collections.defaultdict(list)
-        vnodes = collections.defaultdict(list)
-        links = collections.defaultdict(set)
-        allkeys = set()
+class GraphIndex:
+    """
+    The links generated by a graph script: deduplicated, with duplicate
+    nodes numbered, and indexed by topic. Independent of memory model
+    data, so that it can be cached between runs (see mg.data.load_graph).
+
+    Links are stored as (u, v, topic, load order, key) tuples, and each
+    topic segment (e.g. "nouns", for links with topic "de.nouns") maps
+    to a Bitset of positions in the list of links, as does each full
+    topic in `exact_topics` (from which a TopicTrie is built).
+    """
+    def __init__(self, items):
+        nodes = {}              # shared nodes cast from primitives
+        seen = set()
+        self.links = []
+        self.topics = collections.defaultdict(Bitset)
+        self.exact_topics = collections.defaultdict(Bitset)
         for i, (u, v, *t) in enumerate(items):
-            # topic is optional
-            t = t[0] if t else ""
+            # topic is optional (and repeated, so interned)
+            t = sys.intern(t[0]) if t else ""
             # cast from primitive types
-            u = load_node(u)
-            v = load_node(v)
-            # load memory model
+            u = load_node(u, nodes)
+            v = load_node(v, nodes)
+            # filter out duplicate links
             lindex = f"{u.index()}-[{t}]-{v.index()}"
-            model = MemoryModel(lindex, database, log)
-            # filter out duplicate links and number duplicate nodes
-            if lindex in links:
+            if lindex in seen:
                 # we have already processed an identical link
                 continue
-            # and number duplicate u or v nodes with distinct connections
-            # TODO: Do this more efficiently of course
-            if u in unodes:
-                u.setnum(len(unodes[u])+1)
-                unodes[u][0].setnum(1)
-            unodes[u].append(u)
-            if v in vnodes:
-                v.setnum(len(vnodes[v])+1)
-                vnodes[v][0].setnum(1)
-            vnodes[v].append(v)
-            # load and index link
-            link = Link(u, v, t, model, i)
+            seen.add(lindex)
+            # index link
             for topic in t.split("."):
-                links[topic].add(link)
-            if link.m.is_new():
-                links[".new"].add(link)
+                self.topics[topic].add(len(self.links))
+            self.exact_topics[t].add(len(self.links))
+            self.links.append((u, v, t, i, lindex))
+        self.topics = dict(self.topics)
+        self.exact_topics = dict(self.exact_topics)
+        self._number_duplicates()
+
+    def _number_duplicates(self):
+        """
+        Number the duplicate u nodes (equal u nodes with distinct
+        connections), and likewise the duplicate v nodes, 1, 2, ... in
+        load order. Numbered nodes are copies, since nodes may be shared.
+        """
+        ucounts = collections.Counter(u for u, *_ in self.links)
+        vcounts = collections.Counter(v for _, v, *_ in self.links)
+        unums = collections.Counter()
+        vnums = collections.Counter()
+        for j, (u, v, t, i, lindex) in enumerate(self.links):
+            if ucounts[u] == 1 and vcounts[v] == 1:
+                continue
+            if ucounts[u] > 1:
+                unums[u] += 1
+                u = u.numbered(unums[u])
+            if vcounts[v] > 1:
+                vnums[v] += 1
+                v = v.numbered(vnums[v])
+            self.links[j] = (u, v, t, i, lindex)
+
+
+# # #
+# Topic Trie
+#
+
+class TopicTrie:
+    """
+    The hierarchy of dotted topics: links with topic "de.nouns.a1" are
+    in the subtree of topic "de.nouns", which is in the subtree of topic
+    "de", which is in the subtree of the root topic "" (with all links).
+    Each node knows the links in its subtree (as a Bitset of ordinals,
+    built on first use), and holds aggregates of their memory models
+    (see KnowledgeGraph.summary), also computed on first use and then
+    kept up to date as the models change.
+    """
+    def __init__(self, exact_topics):
+        """
+        exact_topics: maps each topic to a Bitset of the links with
+        exactly that topic (see GraphIndex)
+        """
+        self.root = TopicNode()
+        for topic, links in exact_topics.items():
+            node = self.root
+            for segment in _segments(topic):
+                node = node.children.setdefault(segment, TopicNode())
+            node.exact = links
+
+    def find(self, topic):
+        """the node for `topic`, or None if no link is in its subtree"""
+        node = self.root
+        for segment in _segments(topic):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def path(self, topic):
+        """the nodes from the root to the node for (a link's) `topic`"""
+        node = self.root
+        nodes = [node]
+        for segment in _segments(topic):
+            node = node.children[segment]
+            nodes.append(node)
+        return nodes
+
+    def walk(self, topic=""):
+        """
+        generate (topic, depth, node) triples for the subtree of `topic`
+        in depth-first order (siblings in sorted order)
+        """
+        node = self.find(topic)
+        if node is None:
+            return
+        stack = [(topic, 0, node)]
+        while stack:
+            topic, depth, node = stack.pop()
+            yield topic, depth, node
+            for segment in sorted(node.children, reverse=True):
+                child = f"{topic}.{segment}" if topic else segment
+                stack.append((child, depth+1, node.children[segment]))
+
+
+class TopicNode:
+    __slots__ = ('children', 'exact', '_links', 'counts', 'recall')
+
+    def __init__(self):
+        self.children = {}      # segment -> TopicNode
+        self.exact = None       # links with exactly this topic, if any
+        self._links = None      # links in the subtree (built on first use)
+        self.counts = None      # [new, seen, forgot] (see summary)
+        self.recall = None      # sum of predicted recall (see summary)
+
+    def links(self):
+        """a Bitset of the ordinals of the links in this subtree"""
+        if self._links is None:
+            parts = [c.links() for c in self.children.values()]
+            if self.exact is not None:
+                parts.append(self.exact)
+            if len(parts) == 1:
+                self._links = parts[0]
+            else:
+                self._links = Bitset.union(*parts)
+        return self._links
+
+
+def _segments(topic):
+    # (the root topic "" has no segments)
+    return topic.split(".") if topic else []
+
+
+class TopicSummary(typing.NamedTuple):
+    topic: str
+    new: int                    # links not yet learned
+    seen: int                   # links learned
+    forgot: int                 # seen links last forgotten (or never drilled)
+    recall: float               # mean predicted recall of seen links (or nan)
+    time: int                   # the time of the recall prediction
+
+
+# # #
+# Knowledge Graph
+#
+
+class KnowledgeGraph:
+    """
+    The links of a graph with their memory models. Links are numbered
+    by their position in load order (their 'ordinal'), and topics and
+    statuses (".all", ".new", ".old", ".got", ".forgot") are indexed by
+    Bitsets of ordinals. The status indexes are kept up to date as the
+    links' memory models change (see `restatus`), so that a graph can
+    serve any number of queries and sessions without being rebuilt.
+    Topics are also indexed hierarchically, with aggregate statistics
+    (see `summary`).
+    """
+    @profile.timed
+    def __init__(self, items, database, log, keys):
+        """
+        items: a GraphIndex, or an iterable of (u, v) pairs or (u, v,
+        topic) triples as yielded by a graph script
+        keys: the KeyTable giving the links' IDs (by which the database
+        and log store them), which assigns IDs to any new links
+        """
+        if not isinstance(items, GraphIndex):
+            items = GraphIndex(items)
+        # load memory models for all links and index by status
+        n = len(items.links)
+        self.links = []         # ordinal -> link
+        self.ordinals = {}      # link ID -> ordinal
+        self.bits = {
+            ".all": Bitset.from_int((1 << n) - 1),
+            ".new": Bitset(size=n),
+            ".old": Bitset(size=n),
+            ".got": Bitset(size=n),
+            ".forgot": Bitset(size=n),
+        }
+        self.due = DueIndex()
+        for j, (u, v, t, i, lindex) in enumerate(items.links):
+            model = MemoryModel(keys.id(lindex), database, log, self.due, self)
+            self.links.append(Link(u, v, t, model, i))
+            self.ordinals[model.id] = j
+            if model.is_new():
+                self.bits[".new"].add(j)
             else:
-                links[".old"].add(link)
-                if link.m.is_recalled():
-                    links[".got"].add(link)
+                self.bits[".old"].add(j)
+                if model.is_recalled():
+                    self.bits[".got"].add(j)
                 else:
-                    links[".forgot"].add(link)
-            links[".all"].add(link)
-            links[lindex].add(link)
-            allkeys.add(lindex)
-        self.links = links
-        self.keys = list(allkeys)
+                    self.bits[".forgot"].add(j)
+        self.bits.update(items.topics)
+        self.trie = TopicTrie(items.exact_topics)
+        self.recall = None      # ordinal -> predicted recall (see summary)
+        self.recall_time = None # the time of those predictions
+        # ordinal -> key (the key table's copies, to share them)
+        self.keys = [keys.key(link.m.id) for link in self.links]
+        self.key_table = keys
+        self.database = database
+        self.log = log
+
+    def link(self, key):
+        """the link with link key `key` (KeyError if there is none)"""
+        j = self.ordinals.get(self.key_table.find(key))
+        if j is None:
+            raise KeyError(key)
+        return self.links[j]
+
+    def key(self, link):
+        """the link key of `link` (for display)"""
+        return self.key_table.key(link.m.id)
+
+    def restatus(self, link_id):
+        """
+        move the link with ID `link_id` to the status indexes matching
+        its memory model, and update the aggregates of its topics (see
+        `summary`), called by the model whenever it changes
+        """
+        j = self.ordinals.get(link_id)
+        if j is None:
+            return
+        link = self.links[j]
+        bits = self.bits
+        was_new, was_forgot = j in bits[".new"], j in bits[".forgot"]
+        if link.m.is_new():
+            bits[".new"].add(j)
+            for status in (".old", ".got", ".forgot"):
+                bits[status].discard(j)
+        else:
+            bits[".new"].discard(j)
+            bits[".old"].add(j)
+            if link.m.is_recalled():
+                bits[".got"].add(j)
+                bits[".forgot"].discard(j)
+            else:
+                bits[".forgot"].add(j)
+                bits[".got"].discard(j)
+        # update the aggregates of the link's topic and its ancestors
+        path = self.trie.path(link.t)
+        is_new, is_forgot = j in bits[".new"], j in bits[".forgot"]
+        dnew = is_new - was_new
+        dforgot = is_forgot - was_forgot
+        for node in path:
+            if node.counts is not None:
+                node.counts[0] += dnew
+                node.counts[1] -= dnew
+                node.counts[2] += dforgot
+        if self.recall is not None:
+            old = self.recall[j]
+            new = math.nan
+            if not is_new and any(node.recall is not None for node in path):
+                # (as of the link's last review, if since the reference time)
+                time = max(self.recall_time, link.m.db.last_time[link.m.row])
+                new = self.predict([link], exact=True, time=time)[0]
+            self.recall[j] = new
+            delta = (0 if is_new else new) - (0 if math.isnan(old) else old)
+            for node in path:
+                if node.recall is not None:
+                    node.recall += delta
+
+    def summary(self, topic="", refresh=RECALL_REFRESH):
+        """
+        Summarise the links in the subtree of `topic` (a TopicSummary),
+        or return None if there are none. Counts are kept up to date as
+        models change, so this takes time proportional to the depth of
+        the topic (after first use). Expected recall falls over time, so
+        mean recall is predicted as of a fixed time (with updates to
+        models made since then accounted for), which is moved to the
+        current time (rescoring on demand) once `refresh` seconds old
+        (links reviewed since then count as of their last review).
+        """
+        node = self.trie.find(topic)
+        if node is None:
+            return None
+        if node.counts is None:
+            links = node.links()
+            node.counts = [
+                len(links & self.bits[".new"]),
+                len(links & self.bits[".old"]),
+                len(links & self.bits[".forgot"]),
+            ]
+        now = _current_time()
+        if self.recall_time is None or now - self.recall_time > refresh:
+            self.recall = array('d', [math.nan]) * len(self.links)
+            self.recall_time = now
+            for _, _, n in self.trie.walk():
+                n.recall = None
+        if node.recall is None:
+            seen = list(node.links() & self.bits[".old"])
+            unknown = [j for j in seen if math.isnan(self.recall[j])]
+            probs = self.predict(
+                [self.links[j] for j in unknown],
+                exact=True,
+                time=self.recall_time,
+            )
+            for j, p in zip(unknown, probs):
+                self.recall[j] = p
+            node.recall = math.fsum(self.recall[j] for j in seen)
+        new, seen, forgot = node.counts
+        return TopicSummary(
+            topic=topic,
+            new=new,
+            seen=seen,
+            forgot=forgot,
+            recall=node.recall / seen if seen else math.nan,
+            time=self.recall_time,
+        )
+
+    def _bits(self, topic):
+        if topic in self.bits:
+            return self.bits[topic]
+        j = self.ordinals.get(self.key_table.find(topic))
+        if j is not None:
+            return Bitset([j])
+        if "." in topic:
+            # a topic path, e.g. "de.nouns" (or "de." for top-level "de")
+            node = self.trie.find(topic.rstrip("."))
+            if node is not None:
+                return node.links()
+        return Bitset()
 
     def _query(self, topics=None, new=False, review=False):
         if not topics:
@@ -194,21 +618,29 @@ class KnowledgeGraph:
             topics = [".old", *topics]
         if review:
             topics = [".forgot", *topics]
-        links = set.intersection(*(self.links[t] for t in topics))
-        return links
+        return Bitset.intersection(*(self._bits(t) for t in topics))
 
     def count(self, topics=None, new=False, review=False):
-        links = self._query(topics, new, review)
-        return len(links)
+        return len(self._query(topics, new, review))
+
+    def select(self, topics=None, new=False, review=False):
+        """the links matching a query, in load order (without scoring)"""
+        return [self.links[j] for j in self._query(topics, new, review)]
 
+    @profile.timed
     def query(self, number=None, topics=None, new=False, review=False):
-        links = self._query(topics, new, review)
+        if number is not None and not new:
+            # try to avoid scoring every link
+            links = self._query_due(number, topics, review)
+            if links is not None:
+                return links
+        links = self.select(topics, new, review)
         if new:
-            # sort by lowest rank in load order
-            key = lambda l: l.i
-        else:
-            # sort by lowest recall probability
-            key = lambda l: l.m.predict()
+            # lowest rank in load order (ordinals are in load order)
+            return links[:number]
+        # sort by lowest recall probability (scored in one batch)
+        scores = dict(zip(map(id, links), self.predict(links)))
+        key = lambda l: scores[id(l)]
         if number is None:
             # full sort
             return sorted(links, key=key)
@@ -216,3 +648,66 @@ class KnowledgeGraph:
             # just efficiently find the lowest k please
             return topk.topk(links, number, key=key, reverse=True)
 
+    def index_due(self):
+        """
+        build the due-time index (see DueIndex), for a graph that will
+        serve many queries (e.g. the daemon's, see mg.server)
+        """
+        if not self.due.is_built():
+            with profile.span("DueIndex.build"):
+                self.due.build(
+                    (self.links[j].m.row, self.links[j].m.due())
+                    for j in self.bits[".old"]
+                )
+
+    def _query_due(self, number, topics=None, review=False):
+        """
+        find the lowest-recall `number` links among those already due,
+        if the due-time index is built, and there are enough due links
+        but few enough to be worth it (otherwise, return None)
+        """
+        if not self.due.is_built():
+            return None
+        limit = int(len(self.due.times) * DUE_INDEX_LIMIT)
+        overdue = list(itertools.islice(
+            self.due.overdue(_current_time()),
+            limit + 1,
+        ))
+        if len(overdue) > limit:
+            return None
+        filters = [self._bits(t) for t in topics or []]
+        if review:
+            filters.append(self.bits[".forgot"])
+        links = []
+        row_keys = self.database.row_keys
+        for row in overdue:
+            j = self.ordinals.get(row_keys[row])
+            if j is not None and all(j in f for f in filters):
+                links.append(self.links[j])
+        if len(links) < number:
+            return None
+        scores = dict(zip(map(id, links), self.predict(links)))
+        key = lambda l: scores[id(l)]
+        return topk.topk(links, number, key=key, reverse=True)
+
+    def predict(self, links, exact=False, time=None):
+        """
+        compute the expected (log) probability of recalling each of a
+        sequence of (initialised) links, all at the same time (default:
+        the current time)
+        """
+        now = _current_time() if time is None else time
+        profile.count("links scored", len(links))
+        rows = [l.m.row for l in links]
+        prior_params, last_times = self.database.gather(rows)
+        ln_gamma_ratio = self.database.gather_ln_gamma_ratio(rows)
+        elapsed_times = [now - t for t in last_times]
+        if exact:
+            return webisu.p_recall_t_mean_batch(
+                elapsed_times, prior_params, ln_gamma_ratio,
+            )
+        else:
+            return webisu.p_recall_t_lnmean_batch(
+                elapsed_times, prior_params, ln_gamma_ratio,
+            )
+
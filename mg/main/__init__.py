@@ -1,54 +1,103 @@
+import os
 import sys
 
+import mg.media as media
+import mg.profile as profile
 from mg.mgio    import print
 from mg.options import get_options
 from mg.graph   import KnowledgeGraph
-from mg.data    import Database, Log, load_graph
-
-from mg.main.status  import run_status
-from mg.main.drill   import run_drill
-from mg.main.learn   import run_learn
-from mg.main.checkup import run_checkup
-from mg.main.info    import run_info
+from mg.data    import Database, Log, KeyTable, load_graph, convert_keys
+from mg.data    import SQLiteDatabase, SQLiteLog, SQLiteKeyTable
+from mg.data    import convert_to_sqlite
 
 def main():
     # parse command-line input
     options = get_options()
+    if options.profile:
+        profile.enable()
     print("<bold>**<reset> welcome <bold>**<reset>")
 
+    # run in (or through) a daemon serving the deck
+    if options.subcommand == "serve":
+        from mg.server import serve
+        serve(options)
+        return
+    if os.path.lexists(options.socket_path):
+        from mg.server import run_client
+        status = run_client(options)
+        if status is not None:
+            sys.exit(status)
+
     # load graph and memory model data
     try:
-        db = Database(options.db_path)
-        log = Log(options.log_path, load=options.load_log)
-        graph = KnowledgeGraph(load_graph(options.graph_path), db, log)
+        with profile.span("load"):
+            db, log, graph = load(options)
     except Exception as e:
         print(f"<red><bold>data error ({e.__class__.__name__}):<reset>", e)
         sys.exit(1)
 
     # run program
-    saving = False
+    session(graph, db, log, options)
+
+    # report profile
+    if options.profile:
+        profile.report(print=print)
+        if options.profile_trace is not None:
+            profile.dump(options.profile_trace)
+
+
+def load(options):
+    if options.sqlite:
+        if not os.path.lexists(options.sqlite_path):
+            print("converting data to sqlite...", flush=True, end=" ")
+            convert_to_sqlite(
+                options.db_path,
+                options.log_path,
+                options.keys_path,
+                options.sqlite_path,
+            )
+            print("done!")
+        keys = SQLiteKeyTable(options.sqlite_path)
+        db = SQLiteDatabase(options.sqlite_path, keys)
+        log = SQLiteLog(options.sqlite_path, keys)
+    else:
+        keys = KeyTable(options.keys_path)
+        if keys.is_new() and (os.path.lexists(options.db_path)
+                or os.path.lexists(options.log_path)):
+            print("converting data to link IDs...", flush=True, end=" ")
+            convert_keys(keys, options.db_path, options.log_path)
+            print("done!")
+        db = Database(options.db_path, keys, journal=options.journal)
+        log = Log(options.log_path, keys)
+    graph = KnowledgeGraph(
+        load_graph(options.graph_path, options.cache_path),
+        db,
+        log,
+        keys,
+    )
+    keys.save() # (IDs of any new links)
+    return db, log, graph
+
+
+# subcommands that change memory models (saved even if interrupted)
+SAVING = {"drill", "review", "learn", "recompute"}
+
+
+def session(graph, db, log, options):
+    """
+    Run the subcommand and save any changes (unless input ended before
+    it finished---though changes autosaved by then are kept). Returns
+    whether the changes were saved.
+    """
+    media.configure(
+        engine_name=options.speech_engine,
+        workers=options.speech_workers,
+        cache_path=options.audio_path,
+    )
+    saving = options.subcommand in SAVING
     try:
-        if options.subcommand == "status":
-            saving = False
-            run_status(graph, options)
-        elif options.subcommand == "drill":
-            saving = True
-            run_drill(graph, options)
-        elif options.subcommand == "review":
-            saving = True
-            run_drill(graph, options, review=True)
-        elif options.subcommand == "learn":
-            saving = True
-            run_learn(graph, options)
-        elif options.subcommand == "info":
-            saving = False
-            run_info(graph, options)
-        elif options.subcommand == "checkup":
-            saving = False
-            run_checkup(graph, db, log, options)
-        else:
-            saving = False
-            print(subcommand, "not implemented")
+        with profile.span(f"run {options.subcommand}"):
+            run_subcommand(graph, db, log, options)
     except KeyboardInterrupt:
         print("\nbye!")
     except EOFError:
@@ -56,7 +105,35 @@ def main():
         saving = False
     if saving:
         print("saving...", flush=True, end=" ")
-        db.save()
-        log.save()
+        with profile.span("save"):
+            db.save()
+            log.save()
         print("done!")
+    return saving
+
 
+def run_subcommand(graph, db, log, options):
+    # (subcommand modules are imported on demand, for faster startup)
+    if options.subcommand == "status":
+        from mg.main.status import run_status
+        run_status(graph, options)
+    elif options.subcommand == "drill":
+        from mg.main.drill import run_drill
+        run_drill(graph, options)
+    elif options.subcommand == "review":
+        from mg.main.drill import run_drill
+        run_drill(graph, options, review=True)
+    elif options.subcommand == "learn":
+        from mg.main.learn import run_learn
+        run_learn(graph, options)
+    elif options.subcommand == "info":
+        from mg.main.info import run_info
+        run_info(graph, options)
+    elif options.subcommand == "checkup":
+        from mg.main.checkup import run_checkup
+        run_checkup(graph, db, log, options)
+    elif options.subcommand == "recompute":
+        from mg.main.recompute import run_recompute
+        run_recompute(graph, db, log, options)
+    else:
+        print(options.subcommand, "not implemented")
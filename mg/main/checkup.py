@@ -1,17 +1,16 @@
 from mg.mgio import print, input
 
 def run_checkup(graph, db, log, options):
-    loaded_keys = set(graph.keys)
-    
+    loaded_ids = set(graph.ordinals)
+
     # check database
-    stored_keys = set(db.keys())
+    stored_ids = set(db.keys())
     print("orphaned keys in database:")
-    for key in stored_keys - loaded_keys:
-        print('<bold>*<reset>', key)
-    
+    for id in sorted(stored_ids - loaded_ids):
+        print('<bold>*<reset>', graph.key_table.key(id))
+
     # check log
-    logged_keys = set(l['id'] for l in log.old_lines)
+    logged_ids = log.ids()
     print("orphaned keys in log file:")
-    for key in logged_keys - loaded_keys:
-        print('<bold>*<reset>', key)
-
+    for id in sorted(logged_ids - loaded_ids):
+        print('<bold>*<reset>', graph.key_table.key(id))
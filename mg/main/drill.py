@@ -1,8 +1,14 @@
 import random
 
-from mg.mgio import print, input
+import mg.media as media
+import mg.main.loop as loop
+from mg.mgio import print
 
 def run_drill(graph, options, review=False):
+    loop.run(drill, graph, options, review)
+
+
+async def drill(session, graph, options, review):
     # decide which cards to drill
     print("drill some old cards...")
     hand = graph.query(
@@ -16,31 +22,43 @@ def run_drill(graph, options, review=False):
         return
     random.shuffle(hand)
 
-    # drill the cards
-    for i, link in enumerate(hand, 1):
-        print(f"<bold>**<reset> drill {i}/{n} <bold>**<reset>")
+    # drill the cards (updating each card's model while the user is
+    # thinking about the next one)
+    def sides(link):
         if options.reverse:
-            face, back = link.v, link.u
+            return link.v, link.u
         else:
-            face, back = link.u, link.v
+            return link.u, link.v
+    for i, link in enumerate(hand, 1):
+        print(f"<bold>**<reset> drill {i}/{n} <bold>**<reset>")
+        face, back = sides(link)
         if link.t: print("topics:", link.t)
         print("prompt:", face.label())
         face.media()
-        guess = input("recall:")
+        # synthesise the next card's speech while this one is recalled
+        # (if caching speech, see mg.media.prefetch)
+        session.defer(back.prefetch)
+        if i < n:
+            for node in sides(hand[i]):
+                session.defer(node.prefetch)
+        guess = await session.input("recall:")
+        media.cancel() # stop speaking the prompt
         if back.match(guess):
             print(f"answer: <bold><green>{back.label()}<reset>")
             back.media()
-            link.m.update(True)
+            session.defer(link.m.update, True)
         else:
             print(f"answer: <bold><red>{back.label()}<reset>")
             back.media()
             instructions = "forgot (↵) | got it (g+↵) | skip (s+↵)"
-            commit = input("commit:", r=instructions)
+            commit = await session.input("commit:", r=instructions)
+            media.cancel() # stop speaking the answer
             if commit == "g":
                 print("<bold><green>got it!<reset>")
-                link.m.update(True)
+                session.defer(link.m.update, True)
             elif commit == "s":
-                link.m.review()
+                session.defer(link.m.review)
             else:
-                link.m.update(False)
+                session.defer(link.m.update, False)
+    await session.flush()
 
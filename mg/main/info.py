@@ -1,5 +1,8 @@
+import time
+
 from mg.mgio import print, input
 from mg.plot import print_bars
+from mg.bitset import Bitset
 from mg.color import colormap_red_green as color, to_hex
 
 def run_info(graph, options):
@@ -17,7 +20,7 @@ def run_info(graph, options):
     # just right!
     else:
         key = keys[0]
-        link = list(graph.links[key])[0]
+        link = graph.link(key)
         print(f"<bold><green>match!<reset> {key}")
         print("topics:", link.t)
         print("node 1:", link.u.label())
@@ -28,19 +31,36 @@ def run_info(graph, options):
             print("status: last reviewed", link.m.elapsed(), "seconds ago")
             print("params:", link.m)
             print("recall:")
-            # pdf histogram # TODO: use CDF instead duh
+            # probability of each 5% interval of recall probability
             support = [(p+0.5)/20 for p in range(20)]
-            pdf = [link.m.density(p)/20 for p in support]
+            cdf = [link.m.cumulative(p/20) for p in range(21)]
+            pmf = [hi - lo for lo, hi in zip(cdf, cdf[1:])]
             print_bars(
-                values=pdf,
+                values=pmf,
                 labels=support,
                 labelformat=".1%",
                 valueformat=".3f",
                 colors=[to_hex(color(p)) for p in support],
             )
+        history = link.m.log.history(link.m.id)
+        if history:
+            print(f"history ({len(history)} events):")
+            for event in history:
+                when = time.strftime("%Y-%m-%d %H:%M", time.localtime(event['time']))
+                print(f"<bold>*<reset> {when} {event['event']}", event['data'] or "")
 
 
 def filter_topics(topics, graph):
-    for key in graph.keys:
-        if all(t in key for t in topics):
+    # dotted topic paths (e.g. "de.nouns") select subtrees of topics, and
+    # other terms match substrings of the keys of the links within them
+    nodes = [graph.trie.find(t.rstrip(".")) if "." in t else None for t in topics]
+    terms = [t for t, node in zip(topics, nodes) if node is None]
+    nodes = [node for node in nodes if node is not None]
+    if nodes:
+        ordinals = Bitset.intersection(*(node.links() for node in nodes))
+        keys = (graph.keys[j] for j in ordinals)
+    else:
+        keys = graph.keys
+    for key in keys:
+        if all(t in key for t in terms):
             yield key
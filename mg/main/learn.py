@@ -1,9 +1,15 @@
 import random
 
-from mg.mgio import print, input
+import mg.media as media
+import mg.main.loop as loop
+from mg.mgio import print
 
 
 def run_learn(graph, options):
+    loop.run(learn, graph, options)
+
+
+async def learn(session, graph, options):
     # decide which links to introduce
     print("introduce some new links...")
     hand = graph.query(
@@ -17,21 +23,31 @@ def run_learn(graph, options):
         return
     random.shuffle(hand)
 
-    # introduce the links
+    # introduce the links (initialising each link's model while the user
+    # is studying the next one)
     for i, link in enumerate(hand, 1):
         print(f"<bold>**<reset> learn {i}/{n} <bold>**<reset>")
         face, back = link.u, link.v
         if link.t: print("topics:", link.t)
         print("prompt:", face.label())
         face.media()
-        input("return:")
+        # synthesise the next card's speech while this one is studied
+        # (if caching speech, see mg.media.prefetch)
+        session.defer(back.prefetch)
+        if i < n:
+            session.defer(hand[i].u.prefetch)
+            session.defer(hand[i].v.prefetch)
+        await session.input("return:")
+        media.cancel() # stop speaking the prompt
         print("answer:", back.label())
         back.media()
         instructions = "easy (g+↵) | medium (↵) | hard (h+↵)"
-        rating = input("rating:", r=instructions)
+        rating = await session.input("rating:", r=instructions)
+        media.cancel() # stop speaking the answer
         if rating == "g":
-            link.m.init([1, 1,  2*24*60*60])
+            session.defer(link.m.init, [1, 1,  2*24*60*60])
         elif rating == "h":
-            link.m.init([1, 1,        1*60])
+            session.defer(link.m.init, [1, 1,        1*60])
         else:
-            link.m.init([1, 1,     1*60*60])
+            session.defer(link.m.init, [1, 1,     1*60*60])
+    await session.flush()
@@ -0,0 +1,106 @@
+"""
+The interactive loop of drill and learn sessions, driven by asyncio so
+that work overlaps with the user's think time: terminal input is read
+in a separate thread, and work deferred with `Session.defer` (such as
+updating the last card's memory model, or preparing the next card) is
+done on the event loop while it waits for the input. Changes are
+also autosaved along the way (see `mg.data.Autosaver`).
+"""
+
+import asyncio
+import functools
+import threading
+import collections
+
+from mg.mgio import input
+from mg.data import Autosaver
+
+
+def run(main, graph, options, *args):
+    """
+    Run a session coroutine main(session, graph, options, *args) to
+    completion, autosaving the graph's changes as configured by options
+    (--autosave, --autosave_interval). Any work still deferred when it
+    finishes (or is interrupted) is done, and any autosaves written,
+    before returning (leaving the rest of the changes for a final save).
+    """
+    autosaver = Autosaver(
+        graph.database,
+        graph.log,
+        every=options.autosave,
+        interval=options.autosave_interval,
+    )
+    session = Session(autosaver)
+    try:
+        asyncio.run(main(session, graph, options, *args))
+    finally:
+        session.finish()
+        autosaver.close()
+
+
+class Session:
+    def __init__(self, autosaver=None):
+        self.deferred = collections.deque()
+        self.autosaver = autosaver
+
+    def defer(self, function, *args, **kwargs):
+        """
+        call function(*args, **kwargs) while next waiting for input
+        (deferred calls are made in order)
+        """
+        self.deferred.append(functools.partial(function, *args, **kwargs))
+
+    async def input(self, prompt, r=None):
+        """
+        read a line of input (see mg.mgio.input), doing any deferred
+        work while waiting for it
+        """
+        line = _read(prompt, r)
+        await self.flush()
+        return await line
+
+    async def flush(self):
+        """
+        do any deferred work, yielding to other tasks in between, then
+        autosave if it is time
+        """
+        while self.deferred:
+            self.deferred.popleft()()
+            await asyncio.sleep(0)
+        if self.autosaver is not None:
+            self.autosaver.poll()
+
+    def finish(self):
+        """do any deferred work, outside of the event loop"""
+        while self.deferred:
+            self.deferred.popleft()()
+
+
+def _read(prompt, r):
+    """
+    Start reading a line of input in a daemon thread (which won't hold
+    up exit if the session is interrupted while waiting), returning a
+    future for the line.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    def read():
+        try:
+            line, exception = input(prompt, r=r), None
+        except BaseException as e: # e.g. EOFError, passed on to the reader
+            line, exception = None, e
+        try:
+            loop.call_soon_threadsafe(_settle, future, line, exception)
+        except RuntimeError:
+            pass # the loop has closed (e.g. the session was interrupted)
+    threading.Thread(target=read, daemon=True).start()
+    return future
+
+
+def _settle(future, line, exception):
+    if future.done():
+        return # (cancelled)
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(line)
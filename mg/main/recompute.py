@@ -0,0 +1,108 @@
+import os
+import collections
+import concurrent.futures
+
+import mg.webisu as webisu
+from mg.mgio import print
+
+
+def run_recompute(graph, db, log, options):
+    # gather the logged events for each link
+    print("reading log...", flush=True, end=" ")
+    events = collections.defaultdict(list)
+    n_events = 0
+    for line in log.lines():
+        events[line['id']].append((line['time'], line['event'], line['data']))
+        n_events += 1
+    print(f"{n_events} events for {len(events)} links")
+
+    # replay them (links are independent, so split them between workers)
+    print("replaying...", flush=True, end=" ")
+    keys = list(events)
+    workers = options.workers or os.cpu_count() or 1
+    if workers == 1 or len(keys) < 2 * CHUNK_SIZE:
+        entries = replay_chunk([events[k] for k in keys])
+    else:
+        chunks = [
+            [events[k] for k in keys[i:i+CHUNK_SIZE]]
+            for i in range(0, len(keys), CHUNK_SIZE)
+        ]
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            entries = [e for es in pool.map(replay_chunk, chunks) for e in es]
+    print("done!")
+
+    # overwrite the database (links with no events become unseen again)
+    recomputed = dict(zip(keys, entries))
+    failed_keys = {k for k, e in recomputed.items() if e is None}
+    for key in failed_keys:
+        print("<red>could not replay<reset>", key, "(keeping its model)")
+        del recomputed[key]
+    changed = 0
+    for key in db.keys():
+        if key in failed_keys:
+            continue
+        i = db.row(key)
+        entry = recomputed.pop(key, {})
+        if entry != _without_derived(db.entry(i)):
+            db.set_entry(i, entry)
+            db.touch(i)
+            changed += 1
+    for key, entry in recomputed.items():
+        i = db.row(key)
+        db.set_entry(i, entry)
+        db.touch(i)
+        changed += 1
+    print(f"{changed} memory models changed")
+
+
+# number of links replayed per worker task
+CHUNK_SIZE = 1024
+
+
+def replay_chunk(chunk):
+    return [replay(events) for events in chunk]
+
+
+def replay(events):
+    """
+    Rebuild a link's data.json entry from its (time, event, data)
+    triples, mirroring the updates made by mg.graph.MemoryModel.
+    Returns None if an update fails (e.g. due to a corrupt log).
+    """
+    try:
+        return _replay(events)
+    except (ArithmeticError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _replay(events):
+    entry = {}
+    for time, event, data in sorted(events, key=lambda e: e[0]):
+        if event == "LEARN":
+            entry = {
+                'priorParams': list(data['prior']),
+                'numDrills': 0,
+                'lastTime': time,
+            }
+        elif not entry:
+            continue # event for a link not (yet) learned
+        elif event == "REVIEW":
+            entry['lastTime'] = time
+        elif event == "DRILL":
+            got = data['got']
+            entry['numDrills'] += 1
+            entry['lastResult'] = got
+            entry['priorParams'] = list(webisu.update_model_bernoulli(
+                r=got,
+                t=time - entry['lastTime'],
+                θ=entry['priorParams'],
+            ))
+            entry['lastTime'] = time
+    return entry
+
+
+def _without_derived(entry):
+    # due times and normalising constants are derived data, recomputed
+    # on demand
+    derived = {'dueTime', 'lnGammaRatio', 'lnBeta'}
+    return {k: v for k, v in entry.items() if k not in derived}
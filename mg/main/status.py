@@ -11,6 +11,8 @@ def run_status(graph, options):
         plot_scatter(graph, options.topics)
     if options.list:
         plot_list(graph, options.topics)
+    if options.tree:
+        plot_tree(graph, options.topics)
 
 
 def plot_histogram(graph, topics):
@@ -22,7 +24,8 @@ def plot_histogram(graph, topics):
         return
     if n_seen > 0:
         print("probability of recall histogram:")
-        probs = [l.m.predict(exact=True) for l in graph.query(topics=topics)]
+        # (no need to sort them, so score the links just once)
+        probs = graph.predict(graph.select(topics=topics), exact=True)
         print_hist(probs, lo=0, hi=1, bins=20, height=56, labelformat="4.0%")
     print(
         f"{n_seen} cards seen ({n_seen/n_total:.0%}),",
@@ -43,8 +46,8 @@ def plot_scatter(graph, topics):
 def plot_list(graph, topics):
     print("cards (probability of recall):")
     i = 1
-    for link in graph.query(topics=topics, new=False):
-        p = link.m.predict(exact=True)
+    links = graph.query(topics=topics, new=False)
+    for link, p in zip(links, graph.predict(links, exact=True)):
         c = to_hex(color(p))
         print(f"<bold>{i:>4d}.<reset>", link, r=f"(<{c}>{p:>6.1%}<reset>)")
         i += 1
@@ -52,3 +55,26 @@ def plot_list(graph, topics):
         print(f"<bold>{i:>4d}.<reset>", link, r="(<faint>unseen<reset>)")
         i += 1
 
+
+def plot_tree(graph, topics):
+    # topics are paths to the subtrees to summarise (default: all)
+    roots = [t.rstrip(".") for t in topics] or [""]
+    for root in roots:
+        if graph.trie.find(root) is None:
+            print(f"no cards with topic {root}! try changing the topic.")
+            continue
+        print("topics (seen / unseen, forgotten, mean recall):")
+        for topic, depth, _ in graph.trie.walk(root):
+            s = graph.summary(topic)
+            name = topic.rsplit(".", 1)[-1] if depth else topic or "(all)"
+            if s.seen:
+                c = to_hex(color(s.recall))
+                recall = f"<{c}>{s.recall:>6.1%}<reset>"
+            else:
+                recall = "<faint>unseen<reset>"
+            print(
+                f"{'  '*depth}<bold>{name}<reset>",
+                f"{s.seen} / {s.new}, {s.forgot}",
+                r=f"({recall})",
+            )
+
@@ -1,24 +1,31 @@
+import os
 import sys
+import json
 import queue
+import shutil
+import hashlib
+import itertools
 import threading
-from subprocess import run, DEVNULL
+import collections
+
+# job priorities (lower runs first)
+PLAY = 0
+PREFETCH = 1
 
 class MediaDaemon:
     def __init__(self):
-        self.queue = queue.SimpleQueue()
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count() # first in, first out within priority
+        self.generation = 0 # incremented to cancel waiting playback
         self.thread = threading.Thread(target=self.loop, daemon=True)
         self.thread.start()
     def loop(self):
         try:
             while True:
-                args = self.queue.get()
-                result = run(args, capture_output=True, text=True)
-                if result.returncode != 0:
-                    raise Exception(
-                            f"Exit with non-zero return code "
-                            f"{result.returncode} and stderr: "
-                            f"{result.stderr.strip()}"
-                        )
+                priority, _order, generation, job = self.queue.get()
+                if priority == PLAY and generation != self.generation:
+                    continue # cancelled
+                job()
         except Exception as e:
             print(
                 "\nERROR Media command failed:\n",
@@ -27,19 +34,289 @@ class MediaDaemon:
                 "\nDisabling media for this session, but you can continue.",
                 file=sys.stderr,
             )
-    def schedule(self, *args):
-        self.queue.put(args)
+    def schedule(self, job, priority=PLAY):
+        self.queue.put((priority, next(self.order), self.generation, job))
+    def cancel(self):
+        self.generation += 1
+
+# the daemon (and its thread) is only started on first use
+md = None
+
+def daemon():
+    global md
+    if md is None:
+        md = MediaDaemon()
+    return md
+
+
+def _run(args):
+    from subprocess import run
+    result = run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(
+                f"Exit with non-zero return code "
+                f"{result.returncode} and stderr: "
+                f"{result.stderr.strip()}"
+            )
+
+
+# # #
+# Speech engines
+#
+
+class Espeak:
+    """
+    The `espeak` command (or a compatible one, such as `espeak-ng`).
+    In stream mode (given no text, and not `--stdin`, which would wait
+    for the end of input), it speaks utterances line by line as they
+    are read from stdin, and the voice of each is chosen with an SSML
+    tag.
+    """
+    def __init__(self, command="espeak"):
+        self.command = command
+    def speak_args(self, text, voice):
+        return [self.command, text, "-v", voice]
+    def synthesise_args(self, text, voice, path):
+        return [self.command, "-v", voice, "-w", path, text]
+    def stream_args(self):
+        return [self.command, "-m"]
+    def stream_line(self, text, voice):
+        text = " ".join(text.split())
+        for c, e in [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")]:
+            text = text.replace(c, e)
+        return f'<voice name="{voice}">{text}</voice>\n'
+
+ENGINES = {
+    "espeak":    Espeak("espeak"),
+    "espeak-ng": Espeak("espeak-ng"),
+}
+DEFAULT_ENGINE = "espeak"
+
+
+class SpeechPool:
+    """
+    A pool of long-lived engine processes (see `stream_args`), so that
+    speaking does not wait for a process to start. Utterances are sent
+    to the first process, so that they are spoken in order. Cancelling
+    kills it (if it was sent anything since the last cancellation) and
+    moves on to the next, waiting process, replacing the killed one.
+
+    If a process can't be started or exits, the pool warns, stops its
+    processes, and from then on runs the engine once per utterance.
+    Once closed, the pool stops its processes and speaks no more.
+    """
+    def __init__(self, engine, workers=2):
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.processes = collections.deque()
+        self.active = False # sent anything since last cancellation?
+        self.failed = False # fallen back to once per utterance?
+        self.closed = False
+        self.lock = threading.Lock()
+    def say(self, text, voice):
+        with self.lock:
+            if self.closed:
+                return
+            if not self.failed:
+                try:
+                    self._say(text, voice)
+                    return
+                except Exception as e:
+                    self._fail(e)
+        _run(self.engine.speak_args(text, voice))
+    def _say(self, text, voice):
+        if not self.processes:
+            self.processes.append(self._start())
+        process = self.processes[0]
+        if process.poll() is not None:
+            raise Exception(
+                f"{self.engine.command} exited with return code "
+                f"{process.returncode}"
+            )
+        process.stdin.write(self.engine.stream_line(text, voice))
+        process.stdin.flush()
+        self.active = True
+        # start any waiting processes after speaking, not before
+        while len(self.processes) < self.workers:
+            self.processes.append(self._start())
+    def cancel(self):
+        with self.lock:
+            if self.active and self.processes:
+                self._stop(self.processes.popleft())
+            self.active = False
+    def close(self):
+        with self.lock:
+            self.closed = True
+            while self.processes:
+                self._stop(self.processes.popleft())
+    def _start(self):
+        from subprocess import Popen, PIPE, DEVNULL
+        return Popen(
+            self.engine.stream_args(),
+            stdin=PIPE,
+            stdout=DEVNULL,
+            stderr=DEVNULL,
+            text=True,
+        )
+    def _fail(self, error):
+        print(
+            "\nWARNING Speech engine process failed:\n",
+            error,
+            f"\nRunning {self.engine.command} once per utterance instead, "
+            "for the rest of this session (see --speech_workers).",
+            file=sys.stderr,
+        )
+        self.failed = True
+        while self.processes:
+            self._stop(self.processes.popleft())
+    def _stop(self, process):
+        try:
+            process.kill()
+            process.wait()
+        except OSError:
+            pass
+
 
-md = MediaDaemon()
+# # #
+# Audio cache
+#
 
-def speak(text, voice="english"):
+# commands for playing a WAV file, in order of preference
+PLAYERS = [["afplay"], ["paplay"], ["aplay", "-q"], ["play", "-q"]]
+
+class AudioCache:
+    """
+    A directory of synthesised utterances (WAV files), each named by a
+    hash of its text, voice, and the synthesis command. Files are touched
+    when used, and the least recently used files are evicted once the
+    directory grows beyond `limit` bytes.
+    """
+    def __init__(self, path, engine, limit=64<<20):
+        self.path = path
+        self.limit = limit
+        self.engine = engine
+        self.size = None # total size, computed on first write
+        self.lock = threading.Lock()
+    def file(self, text, voice):
+        key = json.dumps([self.engine.command, voice, text])
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.path, digest + ".wav")
+    def fetch(self, text, voice):
+        """the path to a WAV file of the utterance, synthesising if needed"""
+        path = self.file(text, voice)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        _run(self.engine.synthesise_args(text, voice, temp_path))
+        os.replace(temp_path, path)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(e.stat().st_size for e in self._entries())
+            else:
+                self.size += os.path.getsize(path)
+            if self.size > self.limit:
+                self._evict(keep=path)
+        return path
+    def _entries(self):
+        return [e for e in os.scandir(self.path) if e.name.endswith(".wav")]
+    def _evict(self, keep):
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if self.size <= self.limit:
+                break
+            if entry.path == keep:
+                continue
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self.size -= size
+            except FileNotFoundError:
+                pass
+
+# the engine, process pool, and cache for this session (see `configure`)
+engine = ENGINES[DEFAULT_ENGINE]
+pool = None
+cache = None
+player = None
+
+def configure(
+        engine_name=DEFAULT_ENGINE,
+        workers=0,
+        cache_path=None,
+        cache_limit=64<<20,
+    ):
+    """
+    Speak with the engine `engine_name`, keeping `workers` processes of
+    it running. With no workers, the engine is run once per utterance,
+    and its audio stored in a cache at `cache_path` (for example, in
+    the deck's data directory), if a command for playing audio files is
+    available. Otherwise, speech is synthesised each time it is spoken.
+
+    Processes are only started when something is first spoken. If the
+    engine and number of workers are unchanged since the last call (e.g.
+    for another session in a daemon, see mg.server), its processes are
+    kept, otherwise they are stopped.
+    """
+    global engine, pool, cache, player
+    engine = ENGINES[engine_name]
+    if pool is not None and (pool.engine, pool.workers) != (engine, workers):
+        pool.close()
+        pool = None
+    if pool is None and workers > 0:
+        pool = SpeechPool(engine, workers)
+    player = next((p for p in PLAYERS if shutil.which(p[0])), None)
+    if pool is None and cache_path is not None and player is not None:
+        cache = AudioCache(cache_path, engine, limit=cache_limit)
+    else:
+        cache = None
+
+
+DEFAULT_VOICE = "english"
+
+def speak(text, voice=DEFAULT_VOICE):
     """
     Speak some text with a given voice. Uses `espeak` library.
     The default voice is "english", but you can use any VoiceName
     (see `espeak --voices`).
 
+    If a cache is configured, the speech is played from the cache
+    (after synthesising it, unless it was prefetched).
+
     TODO: Allow other kwargs, passed to espeak command.
-    TODO: Allow configuration of the TTS engine (e.g. allow 'say' on macos).
     """
-    md.schedule("espeak", text, "-v", voice)
+    voice = voice or DEFAULT_VOICE
+    if pool is not None:
+        daemon().schedule(lambda: pool.say(text, voice))
+    elif cache is not None:
+        daemon().schedule(lambda: _run([*player, cache.fetch(text, voice)]))
+    else:
+        daemon().schedule(lambda: _run(engine.speak_args(text, voice)))
+
+
+def prefetch(text, voice=DEFAULT_VOICE):
+    """
+    Synthesise some text into the cache in the background (if a cache
+    is configured), so that speaking it later starts without delay.
+    Prefetching waits while any speech is waiting to be played.
 
+    Only the cache (with no workers, see `configure`) is prefetched
+    into: engine processes in a pool start speaking without delay
+    anyway, so with a pool, prefetching does nothing.
+    """
+    voice = voice or DEFAULT_VOICE
+    if cache is not None:
+        daemon().schedule(lambda: cache.fetch(text, voice), priority=PREFETCH)
+
+
+def cancel():
+    """
+    Stop any speech still waiting to be played, or (if engine processes
+    are running) still being spoken, e.g. once the user has responded
+    to it (but not before speech they haven't had a chance to hear).
+    """
+    if md is not None:
+        md.cancel()
+        if pool is not None:
+            daemon().schedule(pool.cancel)
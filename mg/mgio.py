@@ -16,6 +16,7 @@ def print(*args, r=None, sep=" ", **kwargs):
 
 
 def input(prompt, r=None, expected_width=1):
+    _setup_readline()
     p = to_ansi(prompt)
     if r is not None:
         p = justify(l=p, r=to_ansi(r), padding=1+expected_width)
@@ -23,11 +24,28 @@ def input(prompt, r=None, expected_width=1):
     # TODO: Backspacing wipes rprompt, which is not redrawn
 
 
+_READLINE_READY = False
+
+def _setup_readline():
+    """
+    Import readline (for line editing in input) and disable history, on
+    first use (so that subcommands without input don't pay for it).
+    """
+    global _READLINE_READY
+    if not _READLINE_READY:
+        try:
+            import readline
+            readline.set_auto_history(False)
+        except ImportError:
+            pass
+        _READLINE_READY = True
+
+
 def justify(l="", r="", padding=0):
     llen = ansi_len(l)
     rlen = ansi_len(r)
     if GLOBAL_OUTPUT_ENABLED:
-        cols = os.get_terminal_size().columns
+        cols = GLOBAL_COLUMNS or os.get_terminal_size().columns
         # TODO: WTF am i doing here with \r when I can just print them both!?
         #       this is only necessary for input?
         if cols >= llen + rlen + padding:
@@ -44,14 +62,17 @@ def config(
         output_enabled=sys.stdout.isatty(),
         # color_support_bits=8,             # other not yet implemented
         error_on_tags=False,
+        columns=None,                       # None: ask the terminal
     ):
     # declare globals
     global GLOBAL_OUTPUT_ENABLED
     # global GLOBAL_COLOR_SUPPORT_BITS
     global GLOBAL_ERROR_ON_TAGS
+    global GLOBAL_COLUMNS
 
     # update globals
     GLOBAL_OUTPUT_ENABLED = output_enabled
+    GLOBAL_COLUMNS = columns
     # GLOBAL_COLOR_SUPPORT_BITS = color_support_bits
     GLOBAL_ERROR_ON_TAGS = error_on_tags
 config()
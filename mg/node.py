@@ -1,7 +1,10 @@
 """
 Node and link classes for defining simple or rich knowledge graphs.
 """
-from mg.media import speak
+import sys
+import copy
+
+from mg.media import speak, prefetch
 
 
 # # #
@@ -13,7 +16,18 @@ class Node:
     A custom node of a knowledge graph, with flexible/independent
     string content for indexing, display, comparison, and (optional)
     vocalisation.
+
+    Nodes are compact (with slots rather than a __dict__, and interned
+    strings, since big decks have hundreds of thousands of them), and
+    are treated as immutable once loaded, so that a node may be shared
+    between links (see `load_node`). So, graph scripts can't set other
+    attributes on nodes; a subclass (without its own slots) can.
     """
+    __slots__ = (
+        'index_str', 'match_str', 'print_str', 'speak_str', 'speak_voice',
+        'num',
+    )
+
     def __init__(
                 self,
                 index_str,
@@ -22,20 +36,20 @@ class Node:
                 speak_str=None,
                 speak_voice=None,
             ):
-        index_str = str(index_str)
+        index_str = sys.intern(str(index_str))
         self.index_str = index_str
         if match_str is None:
             self.match_str = index_str
         else:
-            self.match_str = str(match_str)
+            self.match_str = sys.intern(str(match_str))
         if print_str is None:
             self.print_str = index_str
         else:
-            self.print_str = str(print_str)
+            self.print_str = sys.intern(str(print_str))
         if speak_str is None:
             self.speak_str = None
         else:
-            self.speak_str = str(speak_str)
+            self.speak_str = sys.intern(str(speak_str))
         self.speak_voice = speak_voice
         self.num = None
     def index(self):
@@ -50,8 +64,16 @@ class Node:
     def media(self):
         if self.speak_str is not None:
             speak(self.speak_str, voice=self.speak_voice)
+    def prefetch(self):
+        if self.speak_str is not None:
+            prefetch(self.speak_str, voice=self.speak_voice)
     def setnum(self, num):
         self.num = num
+    def numbered(self, num):
+        """a copy of this node, numbered to distinguish it from others"""
+        node = copy.copy(self)
+        node.num = num
+        return node
     def __hash__(self):
         return hash(self.index_str)
     def __eq__(self, other):
@@ -62,9 +84,20 @@ class Node:
 PRIMITIVE = (str, int, float, bool)
 
 
-def load_node(n):
+def load_node(n, cache=None):
+    """
+    Cast n to a Node. If a cache dict is given, nodes cast from equal
+    primitives are shared.
+    """
     if isinstance(n, PRIMITIVE):
-        return Node(str(n))
+        if cache is None:
+            return Node(str(n))
+        s = str(n)
+        try:
+            return cache[s]
+        except KeyError:
+            node = cache[s] = Node(s)
+            return node
     elif isinstance(n, Node):
         return n
     raise ValueError(f"link node must be mg.graph.Node or {PRIMITIVE}")
@@ -1,6 +1,8 @@
 import os
 import argparse
 
+from mg.media import ENGINES, DEFAULT_ENGINE
+
 # Program information:
 PROGRAM = "mg"
 VERSION = "0.0.4"
@@ -23,8 +25,11 @@ node 2, topic) triples. Nodes can be primitives (str, int, float, bool) or
 of type `mg.node.Node`.
 """
 
-def get_options():
-    """Parse and return command-line arguments."""
+def get_options(argv=None):
+    """
+    Parse and return command-line arguments (from sys.argv, unless a
+    list `argv` is given).
+    """
     parser = argparse.ArgumentParser(
         prog=PROGRAM,
         description=DESCRIP,
@@ -36,6 +41,18 @@ def get_options():
         action='version',
         version=f"{PROGRAM} {VERSION}"
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="print a breakdown of where the time went at exit",
+    )
+    parser.add_argument(
+        '--profile_trace',
+        metavar="TRACE PATH",
+        default=None,
+        help="with --profile, also write a JSON trace of timed spans "
+            "(Chrome trace event format)",
+    )
     
     # most of the action happens within one of the various subcommands:
     subparsers = parser.add_subparsers(
@@ -50,7 +67,9 @@ def get_options():
     superparser.add_argument(
         'topics',
         metavar='TOPIC',
-        help="topic filter (restrict to cards with this topic)",
+        help="topic filter (restrict to cards with this topic, or, "
+            "for a dotted topic path like 'de.nouns' or 'de.', "
+            "to cards in this subtree of topics)",
         nargs="*",
     )
     superparser.add_argument(
@@ -69,6 +88,59 @@ def get_options():
             "(default: GRAPH PATH but with .mg extension)",
         default=None,
     )
+    superparser.add_argument(
+        '--cache',
+        action="store_true",
+        help="reuse the links from the graph script's last run while it "
+            "and the modules, files and directories it read are unchanged "
+            "(don't use for scripts with other inputs, e.g. the date)",
+    )
+    superparser.add_argument(
+        '-j',
+        '--journal',
+        action="store_true",
+        help="save only changed memory models, appending them to a journal "
+            "which is merged into the data file once it grows large",
+    )
+    superparser.add_argument(
+        '--autosave',
+        metavar="N",
+        type=int,
+        help="during drill and learn sessions, save changes in the "
+            "background after every N cards (default: 10; 0 disables)",
+        default=10,
+    )
+    superparser.add_argument(
+        '--autosave_interval',
+        metavar="SECONDS",
+        type=float,
+        help="also save changes in the background once this long has "
+            "passed since the last save (default: 60; 0 disables)",
+        default=60,
+    )
+    superparser.add_argument(
+        '-s',
+        '--sqlite',
+        action="store_true",
+        help="store memory models and log in an SQLite database in DATA PATH "
+            "(existing data are converted on first use; afterwards, the "
+            "database is used whenever it exists)",
+    )
+    superparser.add_argument(
+        '--speech_engine',
+        choices=sorted(ENGINES),
+        help=f"text-to-speech engine (default: {DEFAULT_ENGINE})",
+        default=DEFAULT_ENGINE,
+    )
+    superparser.add_argument(
+        '--speech_workers',
+        metavar="N",
+        type=int,
+        help="number of speech engine processes kept running, so that "
+            "cancelled speech can switch to a waiting one (default: 0, "
+            "running the engine once per utterance)",
+        default=0,
+    )
 
 
     # # #
@@ -173,6 +245,12 @@ def get_options():
             action="store_true",
             help="print every card with elapsed time and expected recall",
         )
+    statusparser.add_argument(
+            '-T',
+            '--tree',
+            action="store_true",
+            help="summarise each topic in the tree of (dotted) topics",
+        )
 
     # # #
     # info command
@@ -194,11 +272,41 @@ def get_options():
             help="fix internal broken references",
         )
 
+    # # #
+    # recompute subcommand
+    # 
+    recomputeparser = subparsers.add_parser(
+            "recompute",
+            parents=[superparser],
+            description="mg recompute: rebuild memory models by replaying "
+                "the log",
+            help="rebuild memory models from the log",
+        )
+    recomputeparser.add_argument(
+            '-w',
+            '--workers',
+            metavar="W",
+            type=int,
+            default=None,
+            help="number of worker processes (default: number of CPUs)",
+        )
+
+    # # #
+    # serve subcommand
+    # 
+    subparsers.add_parser(
+            "serve",
+            parents=[superparser],
+            description="mg serve: keep the graph and memory models loaded, "
+                "and run other mg commands for this data path (which then "
+                "connect to the server through a socket in DATA PATH)",
+            help="keep the graph loaded and serve other commands",
+        )
+
     # # #
     # future commands
     # 
     subparsers.add_parser("history",    help="todo someday...")
-    subparsers.add_parser("recompute",  help="todo someday...")
     subparsers.add_parser("commit",     help="todo someday...")
     subparsers.add_parser("sync",       help="todo someday...")
     subparsers.add_parser("missed",     help="todo someday...")
@@ -206,22 +314,28 @@ def get_options():
     # # #
     # parsing and post-processing
     # 
-    options = parser.parse_args()
+    options = parser.parse_args(argv)
     if options.data_path is None:
         options.data_path = os.path.splitext(options.graph_path)[0] + ".mg"
     options.db_path  = os.path.join(options.data_path, "data.json")
     options.log_path = os.path.join(options.data_path, "log.jsonl")
+    options.keys_path = os.path.join(options.data_path, "keys.jsonl")
+    options.sqlite_path = os.path.join(options.data_path, "data.sqlite")
+    options.audio_path = os.path.join(options.data_path, "audio")
+    options.socket_path = os.path.join(options.data_path, "mg.sock")
+    if options.cache:
+        options.cache_path = os.path.join(options.data_path, "graph.cache")
+    else:
+        options.cache_path = None
+    options.sqlite = options.sqlite or os.path.lexists(options.sqlite_path)
     if options.subcommand == "status":
         if not any([
             options.histogram,
             options.posterior,
             options.scatter,
             options.list,
+            options.tree,
         ]):
             options.histogram = True
-    if options.subcommand == "checkup":
-        options.load_log = True
-    else:
-        options.load_log = False
     return options
 
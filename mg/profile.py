@@ -0,0 +1,100 @@
+"""
+Lightweight timing instrumentation: named spans and counters.
+
+Instrumentation is disabled by default, in which case spans and timed
+functions cost one flag check. Once `enable`d (see the `--profile`
+flag), each span's wall time is accumulated by name, and each span is
+recorded as a trace event that can be written with `dump` (in Chrome's
+trace event format, viewable in chrome://tracing or Perfetto).
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+import contextlib
+
+
+_enabled = False
+_origin = time.perf_counter()
+_totals = {}    # span name -> [calls, seconds]
+_counters = {}  # counter name -> count
+_events = []    # trace events
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextlib.contextmanager
+def span(name):
+    """time the body of a with statement as the span `name`"""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, start, time.perf_counter())
+
+
+def timed(function):
+    """time each call to a function as a span named after it"""
+    name = function.__qualname__
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(name, start, time.perf_counter())
+    return wrapper
+
+
+def count(name, n=1):
+    """add n to the counter `name`"""
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def _record(name, start, end):
+    totals = _totals.setdefault(name, [0, 0.0])
+    totals[0] += 1
+    totals[1] += end - start
+    _events.append({
+        'name': name,
+        'ph': "X",
+        'ts': (start - _origin) * 1e6,
+        'dur': (end - start) * 1e6,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+    })
+
+
+def report(print=print):
+    """print the total time and calls for each span, and the counters"""
+    total = time.perf_counter() - _origin
+    print(f"<bold>profile<reset> (inclusive wall time, {total:.3f}s total):")
+    width = max((len(name) for name in [*_totals, *_counters]), default=0)
+    for name, (calls, seconds) in _totals.items():
+        print(
+            f"  {name:<{width}}  {seconds:8.4f}s {seconds/total:6.1%}",
+            f"({calls} call{'s' if calls != 1 else ''})",
+        )
+    for name, n in _counters.items():
+        print(f"  {name:<{width}}  {n:>8d}")
+
+
+def dump(path):
+    """write the recorded spans and counters as a JSON trace"""
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': _events, 'counters': _counters}, f)
@@ -0,0 +1,373 @@
+"""
+A daemon which keeps a deck loaded between invocations of mg (see
+`serve`), listening on a Unix socket in the deck's data directory.
+While it runs, other invocations of mg for the deck are thin clients
+(see `run_client`): the daemon runs their subcommand, relaying its
+terminal output and input over the socket, and saves any changes. The
+deck is reloaded whenever the graph script, the files it read, or the
+data files change on disk (other than by the daemon itself).
+
+The protocol is one JSON object per line, in each direction. Each
+connection makes a single request, one of:
+
+* {"op": "run", "argv": [...], "graph_path": ..., "color": bool,
+  "columns": int}: run a subcommand, given its command line (argv,
+  without the program name). The daemon sends {"out": text} and
+  {"err": text} messages, and {"read": true} messages, to which the
+  client replies with {"line": text} (with "" at the end of input) or
+  {"interrupt": true}; and finally {"exit": status}.
+* {"op": "status", "topics": [...]}: reply {"seen": n, "new": n,
+  "recall": [...]} with the expected recall probability of each seen
+  link (in load order).
+* {"op": "query", "number": n, "topics": [...], "new": bool, "review":
+  bool}: reply {"links": [...]} with the links chosen (as by drill,
+  review and learn), each as {"key", "u", "v", "t"}.
+* {"op": "update", "key": key, "got": bool}: record (and save) the
+  result of drilling a link, and reply {"recall": p}.
+
+Any request may instead be answered with {"error": message}.
+
+Requests are handled one at a time, so a waiting drill session holds
+up other requests until it is finished.
+"""
+
+import io
+import os
+import sys
+import json
+import signal
+import socket
+import threading
+import contextlib
+
+import mg.mgio as mgio
+from mg.mgio import print
+from mg.data import cached_dependencies
+
+
+def serve(options):
+    """
+    Load the deck, and serve requests until interrupted.
+    """
+    if _listening(options.socket_path):
+        print("<red><bold>error:<reset> already serving", options.data_path)
+        sys.exit(1)
+    from mg.main import load
+    try:
+        deck = Deck(options, load)
+    except Exception as e:
+        print(f"<red><bold>data error ({e.__class__.__name__}):<reset>", e)
+        sys.exit(1)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if os.path.lexists(options.socket_path):
+        os.remove(options.socket_path) # left by a daemon that crashed
+    listener.bind(options.socket_path)
+    listener.listen()
+    # stop on termination as on interruption (finishing any session)
+    stopping = []
+    def terminate(signum, frame):
+        stopping.append(signum)
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+    print("serving", options.data_path, "(interrupt to stop)")
+    try:
+        while not stopping:
+            sock, _ = listener.accept()
+            with Connection(sock) as conn:
+                try:
+                    handle(deck, conn)
+                except (OSError, ValueError) as e:
+                    print("<red>connection error:<reset>", e)
+    except KeyboardInterrupt:
+        print("\nbye!")
+    finally:
+        listener.close()
+        os.remove(options.socket_path)
+
+
+class Deck:
+    """
+    A graph and its memory models, loaded with `load(options)`, and
+    reloaded when any of their files change.
+    """
+    def __init__(self, options, load):
+        self.options = options
+        self._load = load
+        self.load()
+    def load(self):
+        self.db, self.log, self.graph = self._load(self.options)
+        self.graph.index_due()
+        self.watched = [
+            self.options.graph_path,
+            self.options.db_path,
+            self.options.db_path + ".journal",
+            self.options.log_path,
+            self.options.keys_path,
+            self.options.sqlite_path,
+        ]
+        if self.options.cache_path is not None:
+            self.watched += cached_dependencies(self.options.cache_path)
+        self.stamp = self._stamp()
+    def refresh(self):
+        """reload the deck, if any of its files have changed"""
+        if self._stamp() != self.stamp:
+            self.load()
+    def saved(self):
+        """note that the deck's data files were written by the daemon"""
+        self.stamp = self._stamp()
+    def _stamp(self):
+        stamp = []
+        for path in self.watched:
+            try:
+                s = os.stat(path)
+                stamp.append((s.st_mtime_ns, s.st_size))
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+
+def handle(deck, conn):
+    request = conn.receive()
+    if request is None:
+        return
+    try:
+        deck.refresh()
+        op = request.get('op')
+        if op == "run":
+            return run(deck, conn, request)
+        elif op == "status":
+            reply = status(deck, request)
+        elif op == "query":
+            reply = query(deck, request)
+        elif op == "update":
+            reply = update(deck, request)
+        else:
+            reply = {'error': f"unknown op {op!r}"}
+    except Exception as e:
+        reply = {'error': f"{e.__class__.__name__}: {e}"}
+    conn.send(reply)
+
+
+def run(deck, conn, request):
+    from mg.main import session, SAVING
+    from mg.options import get_options
+    if not _same_file(request.get('graph_path'), deck.options.graph_path):
+        raise Exception(f"serving a different graph, {deck.options.graph_path}")
+    status = 0
+    with _remote_terminal(conn, request.get('color'), request.get('columns')):
+        try:
+            options = get_options(request['argv'])
+            # (the deck's paths and storage are those of the daemon)
+            for name in STORAGE_OPTIONS:
+                setattr(options, name, getattr(deck.options, name))
+            saved = session(deck.graph, deck.db, deck.log, options)
+            if saved:
+                deck.saved()
+            if saved and options.subcommand == "recompute":
+                deck.load() # (the graph's links are indexed by status)
+            elif not saved and options.subcommand in SAVING:
+                deck.load() # discard the unsaved changes
+        except SystemExit as e: # e.g. from parsing a bad command line
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            deck.load() # e.g. the client went away; discard any changes
+            raise
+    conn.send({'exit': status})
+
+
+# options naming the deck's files and how they are stored
+STORAGE_OPTIONS = [
+    'graph_path', 'data_path', 'db_path', 'log_path', 'keys_path',
+    'sqlite_path', 'cache_path', 'audio_path', 'socket_path', 'sqlite',
+    'journal',
+]
+
+
+def status(deck, request):
+    graph = deck.graph
+    topics = request.get('topics', [])
+    links = graph.select(topics=topics) # (scored once, below)
+    return {
+        'seen': len(links),
+        'new': graph.count(topics=topics, new=True),
+        'recall': [float(p) for p in graph.predict(links, exact=True)],
+    }
+
+
+def query(deck, request):
+    links = deck.graph.query(
+        number=request.get('number'),
+        topics=request.get('topics', []),
+        new=request.get('new', False),
+        review=request.get('review', False),
+    )
+    return {
+        'links': [
+            {'key': deck.graph.key(l), 'u': l.u.label(), 'v': l.v.label(),
+                't': l.t}
+            for l in links
+        ],
+    }
+
+
+def update(deck, request):
+    link = deck.graph.link(request['key'])
+    if link.m.is_new():
+        raise Exception("link not yet learned")
+    link.m.update(bool(request['got']))
+    deck.db.save()
+    deck.log.save()
+    deck.saved()
+    return {'recall': link.m.predict(exact=True)}
+
+
+# # #
+# Client
+#
+
+def run_client(options):
+    """
+    Run the command line through the daemon serving this deck, if one
+    is listening, relaying its output and input. Returns the exit
+    status, or None if there is no daemon.
+    """
+    try:
+        conn = Connection(_connect(options.socket_path))
+    except OSError:
+        return None
+    with conn:
+        try:
+            columns = os.get_terminal_size().columns
+        except OSError:
+            columns = None
+        conn.send({
+            'op': "run",
+            'argv': sys.argv[1:],
+            'graph_path': os.path.abspath(options.graph_path),
+            'color': mgio.GLOBAL_OUTPUT_ENABLED,
+            'columns': columns,
+        })
+        while True:
+            try:
+                message = conn.receive()
+                if message is None:
+                    print("<red><bold>error:<reset> lost connection to server")
+                    return 1
+                if 'out' in message:
+                    sys.stdout.write(message['out'])
+                    sys.stdout.flush()
+                elif 'err' in message:
+                    sys.stderr.write(message['err'])
+                    sys.stderr.flush()
+                elif 'read' in message:
+                    conn.send({'line': sys.stdin.readline()})
+                elif 'exit' in message:
+                    return message['exit']
+                elif 'error' in message:
+                    print("<red><bold>server error:<reset>", message['error'])
+                    return 1
+            except KeyboardInterrupt:
+                conn.send({'interrupt': True})
+
+
+# # #
+# Connections
+#
+
+class Connection:
+    """
+    A socket carrying one JSON object per line in each direction.
+    Messages may be sent from several threads (e.g. output from the
+    session and media threads).
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile('r', encoding="utf-8")
+        self.writer = sock.makefile('w', encoding="utf-8")
+        self.lock = threading.Lock()
+    def send(self, message):
+        line = json.dumps(message) + "\n"
+        with self.lock:
+            self.writer.write(line)
+            self.writer.flush()
+    def receive(self):
+        """the next message, or None if the other end has closed"""
+        line = self.reader.readline()
+        if not line:
+            return None
+        return json.loads(line)
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        for f in [self.reader, self.writer, self.sock]:
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+class _RemoteOutput(io.TextIOBase):
+    def __init__(self, conn, kind):
+        self.conn = conn
+        self.kind = kind
+    def writable(self):
+        return True
+    def write(self, s):
+        if s:
+            self.conn.send({self.kind: s})
+        return len(s)
+
+
+class _RemoteInput(io.TextIOBase):
+    def __init__(self, conn):
+        self.conn = conn
+    def readable(self):
+        return True
+    def readline(self, size=-1):
+        self.conn.send({'read': True})
+        reply = self.conn.receive()
+        if reply is None:
+            return "" # (end of input)
+        if reply.get('interrupt'):
+            raise KeyboardInterrupt
+        return reply['line']
+
+
+@contextlib.contextmanager
+def _remote_terminal(conn, color, columns):
+    """
+    Send standard output and error to the client, read standard input
+    from the client, and format output for the client's terminal.
+    """
+    stdin = sys.stdin
+    sys.stdin = _RemoteInput(conn)
+    mgio.config(output_enabled=bool(color), columns=columns)
+    try:
+        with contextlib.redirect_stdout(_RemoteOutput(conn, 'out')), \
+                contextlib.redirect_stderr(_RemoteOutput(conn, 'err')):
+            yield
+    finally:
+        sys.stdin = stdin
+        mgio.config()
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _listening(path):
+    try:
+        _connect(path).close()
+        return True
+    except OSError:
+        return False
+
+
+def _same_file(path, other):
+    return path is not None and os.path.abspath(path) == os.path.abspath(other)
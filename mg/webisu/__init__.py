@@ -1,6 +1,16 @@
 from mg.webisu.webisu import p_recall_t_lnpdf
 from mg.webisu.webisu import p_recall_t_pdf
+from mg.webisu.webisu import p_recall_t_lncdf
+from mg.webisu.webisu import p_recall_t_cdf
+from mg.webisu.webisu import t_recall_cdf
 from mg.webisu.webisu import p_recall_t_lnmean
 from mg.webisu.webisu import p_recall_t_mean
+from mg.webisu.webisu import t_recall_lnmean
 from mg.webisu.webisu import update_model_bernoulli
 from mg.webisu.webisu import init_model
+from mg.webisu.webisu import Model
+from mg.webisu.batch import p_recall_t_pdf_batch
+from mg.webisu.batch import p_recall_t_lncdf_batch
+from mg.webisu.batch import p_recall_t_cdf_batch
+from mg.webisu.batch import p_recall_t_lnmean_batch
+from mg.webisu.batch import p_recall_t_mean_batch
@@ -0,0 +1,279 @@
+"""
+Array-in/array-out versions of the webisu recall predictions, for
+scoring many memory models at once (e.g. a whole deck).
+
+Functions:
+
+* p_recall_t_lnmean_batch(t, θ, ln_gamma_ratio=None):
+    logarithm of mean/expected recall probability for each model.
+* p_recall_t_mean_batch(t, θ, ln_gamma_ratio=None):
+    exponentiated version of the above.
+* p_recall_t_pdf_batch(p, t, θ):
+    probability density of recall probability p for each model.
+* p_recall_t_lncdf_batch(p, t, θ, ln_beta=None):
+    logarithm of cumulative density of recall probability p for each
+    model.
+* p_recall_t_cdf_batch(p, t, θ, ln_beta=None):
+    exponentiated version of the above.
+
+Here t is a sequence of elapsed times (one per model) and θ is an
+(α, β, λ) triple of *sequences* of parameters (one column for each
+parameter, one row per model) rather than a triple of numbers---see
+the documentation of `mg.webisu.webisu`. p may be a single number or
+a sequence (one per model). ln_gamma_ratio may be a column of the
+models' precomputed ln Γ(α+β) - ln Γ(α) (see `mg.webisu.webisu.Model`),
+saving two log-gamma evaluations per model in pure Python (NumPy
+computes the whole ratio with its own log-gamma approximation, since
+the exact constants would not cancel with it), and likewise ln_beta
+may be a column of their precomputed ln Β(α, β).
+
+If NumPy is installed, the computation for a batch of at least
+NUMPY_MIN_BATCH models is vectorised and the results are NumPy arrays.
+Otherwise, we fall back to pure Python, and the results are lists.
+NumPy is only imported on first use, since it is slow to import, and
+for small batches (e.g. a small deck) importing it would take longer
+than the pure-Python computation.
+"""
+
+from math import exp, pow as mpow
+
+from mg.webisu.pmath import ln_gammafn, ln_betafn, ln, ln1p
+from mg.webisu.pmath import ln_betainc, _CF_TINY, _CF_EPS, _CF_MAX_ITER
+from mg.profile import timed
+
+_NUMPY = None
+
+# the smallest batch for which NumPy is used (see module documentation)
+NUMPY_MIN_BATCH = 500
+
+
+@timed
+def p_recall_t_lnmean_batch(t, θ, ln_gamma_ratio=None):
+    """
+    Compute log expected recall probability after t[i] units of time
+    since last review, for each model i.
+
+    θ is an (α, β, λ) triple of columns---see module documentation.
+    """
+    α, β, λ = θ
+    np = _numpy(len(t))
+    if np is not None:
+        α, β, λ, t = _arrays(α, β, λ, t)
+        δ = t / λ
+        lnmean = (
+                + _np_ln_gammafn(α+β)
+                - _np_ln_gammafn(α)
+                + _np_ln_gammafn(α+δ)
+                - _np_ln_gammafn(α+β+δ)
+            )
+        # (recall is at most 1, whatever the rounding)
+        return np.minimum(lnmean, 0.0)
+    if ln_gamma_ratio is None:
+        ln_gamma_ratio = [ln_gammafn(a+b) - ln_gammafn(a) for a, b in zip(α, β)]
+    return [
+            min(c + ln_gammafn(a+s/l) - ln_gammafn(a+b+s/l), 0.0)
+            for a, b, l, s, c in zip(α, β, λ, t, ln_gamma_ratio)
+        ]
+
+
+def p_recall_t_mean_batch(t, θ, ln_gamma_ratio=None):
+    """
+    Compute expected recall probability after t[i] units of time
+    since last review, for each model i.
+
+    θ is an (α, β, λ) triple of columns---see module documentation.
+    """
+    lnmean = p_recall_t_lnmean_batch(t, θ, ln_gamma_ratio)
+    np = _numpy(len(t))
+    if np is not None:
+        return np.exp(lnmean)
+    return [exp(m) for m in lnmean]
+
+
+@timed
+def p_recall_t_pdf_batch(p, t, θ):
+    """
+    Compute probability density of recall prob p (or p[i]) after t[i]
+    units of elapsed time since last review, for each model i.
+
+    θ is an (α, β, λ) triple of columns---see module documentation.
+    """
+    α, β, λ = θ
+    np = _numpy(len(t))
+    if np is not None:
+        α, β, λ, t = _arrays(α, β, λ, t)
+        p = np.asarray(p, dtype=float)
+        δ = t / λ
+        lnpdf = (
+                + (α - δ) / δ * np.log(p)
+                + (β - 1) * np.log1p(-np.power(p, 1/δ))
+                - np.log(δ)
+                - _np_ln_gammafn(α)
+                - _np_ln_gammafn(β)
+                + _np_ln_gammafn(α+β)
+            )
+        return np.exp(lnpdf)
+    if isinstance(p, (int, float)):
+        p = [p] * len(t)
+    return [
+            exp(
+                + (a - s/l) / (s/l) * ln(q)
+                + (b - 1) * ln1p(-mpow(q, l/s))
+                - ln(s/l)
+                - ln_betafn(a, b)
+            )
+            for q, a, b, l, s in zip(p, α, β, λ, t)
+        ]
+
+
+@timed
+def p_recall_t_lncdf_batch(p, t, θ, ln_beta=None):
+    """
+    Compute log cumulative density of recall prob p (or p[i]) after
+    t[i] units of elapsed time since last review, for each model i.
+
+    θ is an (α, β, λ) triple of columns---see module documentation.
+    """
+    α, β, λ = θ
+    np = _numpy(len(t))
+    if np is not None:
+        α, β, λ, t = _arrays(α, β, λ, t)
+        p = np.asarray(p, dtype=float)
+        if ln_beta is None:
+            ln_beta = (
+                    + _np_ln_gammafn(α)
+                    + _np_ln_gammafn(β)
+                    - _np_ln_gammafn(α+β)
+                )
+        else:
+            ln_beta, = _arrays(ln_beta)
+        with np.errstate(divide='ignore'):
+            # (where t is 0, p^inf gives 0 or 1, see p_recall_t_lncdf)
+            x = np.power(p, λ / t)
+        return _np_ln_betainc(α, β, x, ln_beta)
+    if isinstance(p, (int, float)):
+        p = [p] * len(t)
+    if ln_beta is None:
+        ln_beta = [None] * len(t)
+    return [
+            ln_betainc(a, b, _gb1_x(q, l, s), c)
+            for q, a, b, l, s, c in zip(p, α, β, λ, t, ln_beta)
+        ]
+
+
+def _gb1_x(p, λ, t):
+    # p^(λ/t), at which to evaluate the beta CDF (see p_recall_t_lncdf)
+    if p <= 0:
+        return 0.0
+    if t == 0:
+        return 1.0 if p >= 1 else 0.0
+    return mpow(p, λ/t)
+
+
+def p_recall_t_cdf_batch(p, t, θ, ln_beta=None):
+    """
+    Compute cumulative density of recall prob p (or p[i]) after t[i]
+    units of elapsed time since last review, for each model i.
+
+    θ is an (α, β, λ) triple of columns---see module documentation.
+    """
+    lncdf = p_recall_t_lncdf_batch(p, t, θ, ln_beta)
+    np = _numpy(len(t))
+    if np is not None:
+        return np.exp(lncdf)
+    return [exp(c) for c in lncdf]
+
+
+# # #
+# NumPy helpers
+#
+
+def _numpy(size=None):
+    """
+    Import and return the numpy module, or None if unavailable, or if
+    given the `size` of a batch too small to be worth it.
+    """
+    global _NUMPY
+    if size is not None and size < NUMPY_MIN_BATCH:
+        return None
+    if _NUMPY is None:
+        try:
+            import numpy
+            _NUMPY = numpy
+        except ImportError:
+            _NUMPY = False
+    return _NUMPY or None
+
+
+def _arrays(*columns):
+    np = _numpy()
+    return [np.asarray(c, dtype=float) for c in columns]
+
+
+# Stirling series coefficients for ln Γ(z), z large: 1/12, -1/360, ...
+_STIRLING = (1/12, -1/360, 1/1260, -1/1680, 1/1188)
+_LN_SQRT_2PI = 0.9189385332046727
+_SHIFT = 8
+
+
+def _np_ln_gammafn(x):
+    """
+    Vectorised logarithm of the gamma function for positive x (NumPy
+    does not provide one).
+
+    Uses the recurrence Γ(x) = Γ(x+n) / (x(x+1)...(x+n-1)) to shift the
+    argument to at least n = 8, and then a truncated Stirling series,
+    which is accurate to about 1e-12 from there.
+    """
+    np = _numpy()
+    shift = np.zeros_like(x)
+    for k in range(_SHIFT):
+        shift += np.log(x + k)
+    z = x + _SHIFT
+    zinv = 1 / z
+    zinv2 = zinv * zinv
+    series = 0.0
+    for c in reversed(_STIRLING):
+        series = series * zinv2 + c
+    return (z - 0.5) * np.log(z) - z + _LN_SQRT_2PI + series * zinv - shift
+
+
+def _np_ln_betainc(a, b, x, ln_beta):
+    """
+    Vectorised version of pmath.ln_betainc (see there for the method).
+    """
+    np = _numpy()
+    a, b, x, ln_beta = np.broadcast_arrays(a, b, x, ln_beta)
+    inside = (x > 0) & (x < 1)
+    y = np.where(inside, x, 0.5) # (outside values are replaced below)
+    swap = y >= (a+1) / (a+b+2)
+    a, b = np.where(swap, b, a), np.where(swap, a, b)
+    y = np.where(swap, 1-y, y)
+    ln_i = _np_ln_betainc_cf(a, b, y, np.log(y), np.log1p(-y), ln_beta)
+    with np.errstate(divide='ignore'):
+        ln_i = np.where(swap, np.log1p(-np.minimum(np.exp(ln_i), 1)), ln_i)
+    return np.where(inside, ln_i, np.where(x <= 0, -np.inf, 0.0))
+
+
+def _np_ln_betainc_cf(a, b, x, ln_x, ln_1mx, ln_beta):
+    np = _numpy()
+    def guard(v):
+        return np.where(np.abs(v) > _CF_TINY, v, _CF_TINY)
+    c = np.ones_like(x)
+    d = 1 / guard(1 - (a+b) * x / (a+1))
+    h = d
+    for m in range(1, _CF_MAX_ITER):
+        # even step
+        n = m * (b-m) * x / ((a+2*m-1) * (a+2*m))
+        d = 1 / guard(1 + n * d)
+        c = guard(1 + n / c)
+        h = h * d * c
+        # odd step
+        n = -(a+m) * (a+b+m) * x / ((a+2*m) * (a+2*m+1))
+        d = 1 / guard(1 + n * d)
+        c = guard(1 + n / c)
+        h = h * d * c
+        # (comparisons with nan are false, so nans count as converged)
+        if not np.any(np.abs(d * c - 1) >= _CF_EPS):
+            break
+    return a * ln_x + b * ln_1mx - ln_beta - np.log(a) + np.log(h)
@@ -9,8 +9,10 @@ from mg.webisu.webisu import p_recall_t_lnpdf       as _p_recall_t_lnpdf
 from mg.webisu.webisu import p_recall_t_pdf         as _p_recall_t_pdf
 from mg.webisu.webisu import p_recall_t_lnmean      as _p_recall_t_lnmean
 from mg.webisu.webisu import p_recall_t_mean        as _p_recall_t_mean
+from mg.webisu.webisu import t_recall_lnmean        as _t_recall_lnmean
 from mg.webisu.webisu import update_model_bernoulli as _update_model_bernoulli
 from mg.webisu.webisu import init_model             as _init_model
+from mg.webisu.pmath  import ln                     as _ln
 
 
 def _convert_prior_to_params(prior):
@@ -25,7 +27,8 @@ def predictRecall(prior, tnow, exact=False):
     """
     See ebisu's predictRecall function documentation.
 
-    Note: No _cachedBetaln (yet)
+    Note: Instead of ebisu's _cachedBetaln, pass a webisu Model
+    (as returned by updateRecall) to reuse its cached constants.
     """
     if exact:
         return _p_recall_t_mean(tnow, _convert_prior_to_params(prior))
@@ -56,10 +59,12 @@ def modelToPercentileDecay(model, percentile=0.5, coarse=False):
     """
     See ebisu's modelToPercentileDecay function documentation.
 
-    Note: Not implemented. All arguments are ignores, and an
-    exception is raised.
+    Note: The coarse argument is ignored (the root is always found
+    to a tight tolerance, which is cheap).
     """
-    raise NotImplementedError("Sorry, modelToPercentilDecay not implemented.")
+    if not 0 < percentile < 1:
+        raise ValueError("percentile must be in (0, 1)")
+    return _t_recall_lnmean(_ln(percentile), _convert_prior_to_params(model))
 
 
 def defaultModel(t, alpha=3.0, beta=None):
@@ -7,7 +7,7 @@ functions and the beta distribution in logarithmic space.
 # Working in log space
 # 
 
-from math import log as ln, log1p as ln1p, exp
+from math import log as ln, log1p as ln1p, exp, inf
 
 
 def lnaddexp(x, y):
@@ -49,6 +49,93 @@ def ln_betafn(α, β):
     return ln_gammafn(α) + ln_gammafn(β) - ln_gammafn(α+β)
 
 
+# continued fraction parameters: underflow guard, tolerance, iteration cap
+_CF_TINY = 1e-300
+_CF_EPS = 1e-15
+_CF_MAX_ITER = 1000
+
+
+def ln_betainc(α, β, x, ln_beta=None):
+    """
+    Compute the logarithm of the regularised incomplete beta function
+    I_x(α, β), that is, of the Beta(α, β) cumulative distribution
+    function at x in [0, 1]. ln_beta may be a precomputed value of
+    ln_betafn(α, β).
+
+    Uses the continued fraction for I_x(α, β), which converges rapidly
+    for x < (α+1)/(α+β+2), evaluated with the modified Lentz method.
+    Above that point, the symmetry I_x(α, β) = 1 - I_{1-x}(β, α) is
+    used instead.
+    """
+    if x <= 0:
+        return -inf
+    if x >= 1:
+        return 0.0
+    if ln_beta is None:
+        ln_beta = ln_betafn(α, β)
+    if x < (α+1) / (α+β+2):
+        return _ln_betainc_cf(α, β, x, ln(x), ln1p(-x), ln_beta)
+    ln_i = _ln_betainc_cf(β, α, 1-x, ln1p(-x), ln(x), ln_beta)
+    if ln_i >= 0:
+        return -inf # complement underflows
+    return lnsubexp(0.0, ln_i)
+
+
+def _ln_betainc_cf(a, b, x, ln_x, ln_1mx, ln_beta):
+    # ln(x^a (1-x)^b / (a B(a, b))) + ln(continued fraction)
+    # (see e.g. Numerical Recipes, section 6.4)
+    c = 1.0
+    d = 1 - (a+b) * x / (a+1)
+    d = 1 / (d if abs(d) > _CF_TINY else _CF_TINY)
+    h = d
+    for m in range(1, _CF_MAX_ITER):
+        # even step
+        n = m * (b-m) * x / ((a+2*m-1) * (a+2*m))
+        d = 1 + n * d
+        d = 1 / (d if abs(d) > _CF_TINY else _CF_TINY)
+        c = 1 + n / c
+        c = c if abs(c) > _CF_TINY else _CF_TINY
+        h *= d * c
+        # odd step
+        n = -(a+m) * (a+b+m) * x / ((a+2*m) * (a+2*m+1))
+        d = 1 + n * d
+        d = 1 / (d if abs(d) > _CF_TINY else _CF_TINY)
+        c = 1 + n / c
+        c = c if abs(c) > _CF_TINY else _CF_TINY
+        h *= d * c
+        if abs(d * c - 1) < _CF_EPS:
+            break
+    return a * ln_x + b * ln_1mx - ln_beta - ln(a) + ln(h)
+
+
+def betaincinv(α, β, q, ln_beta=None, rtol=1e-12):
+    """
+    Compute the x in [0, 1] at which I_x(α, β) = q, that is, the q
+    quantile of a Beta(α, β) distribution.
+
+    The incomplete beta function increases monotonically in x, so we
+    find the root by bisection (on x, until it is within a relative
+    tolerance of rtol), comparing values in log space.
+    """
+    if q <= 0:
+        return 0.0
+    if q >= 1:
+        return 1.0
+    if ln_beta is None:
+        ln_beta = ln_betafn(α, β)
+    ln_q = ln(q)
+    lo, hi = 0.0, 1.0
+    while hi - lo > rtol * hi:
+        mid = (lo + hi) / 2
+        if mid in (lo, hi):
+            break
+        if ln_betainc(α, β, mid, ln_beta) < ln_q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
 
 # # #
 # Beta distribution
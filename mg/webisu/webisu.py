@@ -11,25 +11,29 @@ Functions:
     logarithm of probability density at time t for recall probability p.
 * p_recall_t_pdf(p, t, θ)
     exponentiated version of the above.
+* p_recall_t_lncdf(p, t, θ):
+    logarithm of cumulative density at time t for recall probability p.
+* p_recall_t_cdf(p, t, θ)
+    exponentiated version of the above.
+* t_recall_cdf(p, q, θ):
+    elapsed time at which recall probability is below p with
+    probability q (the inverse of p_recall_t_cdf in t).
 * p_recall_t_lnmean(t, θ):
     logarithm of mean/expected recall probability at time t.
 * p_recall_t_mean(t, θ):
     exponentiated version of the above.
+* t_recall_lnmean(lnp, θ):
+    elapsed time at which the log mean recall probability falls to lnp
+    (the inverse of p_recall_t_lnmean).
 * update_model_bernoulli(r, t, θ):
     return an updated model based on the result of a bernoulli trial
     with result r at time t.
 * init_model(λ, α=2, β=α):
     return an initial model with some optional default values, you
     just need to provide a half-life in your preferred unit of time.
-
-Future functions:
-
-* p_recall_t_lncdf(p, t, θ):
-    logarithm of cumulative density at time t for recall probability p.
-    NOT YET IMPLEMENTED.
-* p_recall_t_cdf(p, t, θ)
-    exponentiated version of the above.
-    NOT YET IMPLEMENTED.
+* Model(α, β, λ):
+    a parameter triple carrying its precomputed normalising constants
+    (returned by the above two functions).
 
 
 On parameters θ:
@@ -42,6 +46,10 @@ the components of this parameter triple is as follows:
     about a fact's recall probability after time λ (also known as the
     'half-life', because the Beta prior is often symmetric about 0.5).
 
+Any (α, β, λ) triple will do, but if θ is a Model, the terms which
+depend only on α and β are not recomputed, so that scoring a model
+takes two log-gamma evaluations instead of four.
+
 TODO:
 
 * Consider putting a cap/floor on δ during updates, since this might help
@@ -54,8 +62,52 @@ TODO:
 from math import exp, pow as mpow
 
 from mg.webisu.pmath import ln_gammafn, ln_betafn
+from mg.webisu.pmath import ln_betainc, betaincinv
 from mg.webisu.pmath import ln, ln1p, lnsubexp
 from mg.webisu.pmath import beta_match_moments
+from mg.profile import timed
+
+class Model(tuple):
+    """
+    An (α, β, λ) triple (see module documentation) which also carries
+    the normalising constants of its Beta distribution:
+
+    * ln_gamma_ratio = ln Γ(α+β) - ln Γ(α), for the expected recall;
+    * ln_beta = ln Β(α, β), for the density.
+
+    These are computed on construction, unless given (e.g. when they
+    were previously saved).
+    """
+    def __new__(cls, α, β, λ, ln_gamma_ratio=None, ln_beta=None):
+        self = super().__new__(cls, (α, β, λ))
+        if ln_gamma_ratio is None or ln_beta is None:
+            ln_γ_α, ln_γ_β, ln_γ_αβ = (
+                ln_gammafn(α), ln_gammafn(β), ln_gammafn(α+β)
+            )
+            ln_gamma_ratio = ln_γ_αβ - ln_γ_α
+            ln_beta = ln_γ_α + ln_γ_β - ln_γ_αβ
+        self.ln_gamma_ratio = ln_gamma_ratio
+        self.ln_beta = ln_beta
+        return self
+    def __getnewargs__(self):
+        return (*self, self.ln_gamma_ratio, self.ln_beta)
+    def __repr__(self):
+        return "Model(α={}, β={}, λ={})".format(*self)
+
+
+def _ln_gamma_ratio(θ):
+    if isinstance(θ, Model):
+        return θ.ln_gamma_ratio
+    α, β, _ = θ
+    return ln_gammafn(α+β) - ln_gammafn(α)
+
+
+def _ln_beta(θ):
+    if isinstance(θ, Model):
+        return θ.ln_beta
+    α, β, _ = θ
+    return ln_betafn(α, β)
+
 
 # TODO: Also move GB1 pdf and expectation to a stats module? Then this
 # module could just be about piping the parameters into the distribns...!
@@ -79,7 +131,7 @@ def p_recall_t_lnpdf(p, t, θ):
             + (α - δ) / δ * ln(p)
             + (β - 1) * ln1p(-mpow(p, 1/δ))
             - ln(δ)
-            - ln_betafn(α, β)
+            - _ln_beta(θ)
         )
     return lnpdf
 
@@ -100,20 +152,22 @@ def p_recall_t_lncdf(p, t, θ):
     of elapsed time since last review.
 
     θ is an (α, β, λ) triple--see module documentation.
-
-    TODO: Implement (!) incomplete beta function to help with the
-    computation
     """
     α, β, λ = θ
     δ = t / λ
 
-    # F_GB1(p; 1/δ, 1, α, β) = F_B(x/d; α, β)
+    # F_GB1(p; 1/δ, 1, α, β) = F_B(p^(1/δ); α, β)
     # according to:
     # "Butler and McDonald (1989) and Kleiber and Kotz (2003)",
     # as summarised in
     # Sarabia, Guillen, Chulia, and Prieto, "Tail risk measures using flex-
     # ible parametric distributions", SORT 2019; DOI 10.2436/20.8080.02.86
-    return NotImplementedError("TODO: Needs the incomplete beta function")
+    if p <= 0:
+        return ln_betainc(α, β, 0.0)
+    if δ == 0:
+        # no time has elapsed, so recall is certain (p^(1/δ) -> 0 or 1)
+        return ln_betainc(α, β, 1.0 if p >= 1 else 0.0, _ln_beta(θ))
+    return ln_betainc(α, β, exp(ln(p) / δ), _ln_beta(θ))
 
 
 def p_recall_t_cdf(p, t, θ):
@@ -126,6 +180,33 @@ def p_recall_t_cdf(p, t, θ):
     return exp(p_recall_t_lncdf(p, t, θ))
 
 
+def t_recall_cdf(p, q, θ):
+    """
+    Compute the elapsed time since last review at which the recall
+    probability is below p with probability q (that is, invert
+    p_recall_t_cdf in t). For example, with q=0.5, the time at which
+    the median recall probability falls to p.
+
+    Since the recall probability at time t is the recall probability
+    at time λ raised to the power δ = t/λ, its q quantile is x^δ where
+    x is the q quantile of the Beta(α, β) distribution, so we solve for
+    x (see pmath.betaincinv) and then δ.
+
+    θ is an (α, β, λ) triple---see module documentation.
+    """
+    α, β, λ = θ
+    if p >= 1 or q <= 0:
+        return 0.0
+    if p <= 0 or q >= 1:
+        return float('inf')
+    x = betaincinv(α, β, q, _ln_beta(θ))
+    if x >= 1:
+        return float('inf')
+    if x <= 0:
+        return 0.0
+    return λ * ln(p) / ln(x)
+
+
 def p_recall_t_lnmean(t, θ):
     """
     Compute log expected recall probability after t units of time
@@ -138,12 +219,12 @@ def p_recall_t_lnmean(t, θ):
 
     # E_GB1[P] = (Γ(α+β) * Γ(α+δ)) / (Γ(α) * Γ(α+β+δ))
     lnmean = (
-            + ln_gammafn(α+β)
+            + _ln_gamma_ratio(θ)
             + ln_gammafn(α+δ)
-            - ln_gammafn(α)
             - ln_gammafn(α+β+δ)
         )
-    return lnmean
+    # (recall is at most 1, whatever the rounding)
+    return min(lnmean, 0.0)
 
 
 def p_recall_t_mean(t, θ):
@@ -156,6 +237,57 @@ def p_recall_t_mean(t, θ):
     return exp(p_recall_t_lnmean(t, θ))
 
 
+def t_recall_lnmean(lnp, θ, rtol=1e-6):
+    """
+    Compute the elapsed time since last review at which the log
+    expected recall probability falls to lnp (that is, invert
+    p_recall_t_lnmean in t).
+
+    The expected recall probability decreases monotonically with
+    elapsed time, so we bracket the root and then narrow the bracket
+    with the Illinois variant of regula falsi until it is within a
+    relative tolerance of rtol. The lower end of the final bracket is
+    returned, so the result never overshoots the true time.
+
+    θ is an (α, β, λ) triple---see module documentation.
+    """
+    α, β, λ = θ
+    if lnp >= 0:
+        return 0.0
+    c = _ln_gamma_ratio(θ) - lnp
+    f = lambda δ: c + ln_gammafn(α+δ) - ln_gammafn(α+β+δ)
+
+    # bracket the root: f(0) = -lnp > 0, and f decreases without bound
+    lo, f_lo = 0.0, -lnp
+    hi, f_hi = 1.0, f(1.0)
+    while f_hi > 0:
+        lo, f_lo = hi, f_hi
+        hi = 2 * hi
+        if hi > 1e300:
+            return float('inf')
+        f_hi = f(hi)
+
+    # narrow the bracket
+    side = 0
+    while hi - lo > rtol * hi:
+        mid = (lo * f_hi - hi * f_lo) / (f_hi - f_lo)
+        if not lo < mid < hi:
+            mid = (lo + hi) / 2
+        f_mid = f(mid)
+        if f_mid > 0:
+            lo, f_lo = mid, f_mid
+            if side == -1:
+                f_hi /= 2
+            side = -1
+        else:
+            hi, f_hi = mid, f_mid
+            if side == +1:
+                f_lo /= 2
+            side = +1
+    return lo * λ
+
+
+@timed
 def update_model_bernoulli(r, t, θ):
     """
     Compute the approximate Beta posterior model parameters after a
@@ -208,7 +340,7 @@ def update_model_bernoulli(r, t, θ):
     var   = exp(ln_m2) - exp(2*ln_m1)
     
     α_new, β_new = beta_match_moments(mean, var)
-    return (α_new, β_new, λ_new)
+    return Model(α_new, β_new, λ_new)
 
 
 class _analytic_posterior_bernoulli:
@@ -253,5 +385,5 @@ def init_model(λ, α=2, β=None):
     """
     if β is None:
         β = α
-    return (α, β, λ)
+    return Model(α, β, λ)
 
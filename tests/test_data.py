@@ -0,0 +1,168 @@
+import os
+import sys
+import runpy
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mg.data import Database, Log, KeyTable, Autosaver, load_graph
+
+
+def _entry(t):
+    return {'priorParams': [1.0, 1.0, 3600.0], 'numDrills': 1, 'lastTime': t}
+
+
+class Crash(Exception):
+    pass
+
+
+class TestSnapshotCrash(unittest.TestCase):
+    """
+    A process stopping between replacing the snapshot and removing the
+    journal must not replay the (older) journal over the snapshot.
+    """
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.keys = KeyTable(os.path.join(self.path, "keys.jsonl"))
+        self.id = self.keys.id("u-[]-v")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def load(self, journal=False):
+        return Database(
+            os.path.join(self.path, "data.json"),
+            self.keys,
+            journal=journal,
+        )
+
+    def test_stale_journal_skipped(self):
+        db = self.load()
+        i = db.row(self.id)
+        db.set_entry(i, _entry(100))
+        db.touch(i)
+        db.write_changes(db.changes()) # e.g. an autosave
+        db.set_entry(i, _entry(200))
+        db.touch(i)
+        with mock.patch("mg.data.os.remove", side_effect=Crash):
+            with self.assertRaises(Crash):
+                db.save()
+        self.assertTrue(os.path.exists(db.journal_path))
+        db = self.load(journal=True)
+        self.assertEqual(db.entry(db.find(self.id))['lastTime'], 200)
+        self.assertFalse(os.path.exists(db.journal_path))
+        # later changes are journaled (and replayed) as usual
+        i = db.find(self.id)
+        db.set_entry(i, _entry(300))
+        db.touch(i)
+        db.save()
+        db = self.load()
+        self.assertEqual(db.entry(db.find(self.id))['lastTime'], 300)
+
+    def test_journal_replayed(self):
+        db = self.load(journal=True)
+        for t in (100, 200):
+            i = db.row(self.id)
+            db.set_entry(i, _entry(t))
+            db.touch(i)
+            db.save()
+            db._save_snapshot()
+        i = db.find(self.id)
+        db.set_entry(i, _entry(300))
+        db.touch(i)
+        db.save()
+        db = self.load()
+        self.assertEqual(db.entry(db.find(self.id))['lastTime'], 300)
+
+
+class TestAutosave(unittest.TestCase):
+    """
+    Autosaves (written on another thread) and a final snapshot leave
+    the latest models, whichever order the files were last written in.
+    """
+    def test_autosave_then_snapshot(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        keys = KeyTable(os.path.join(path, "keys.jsonl"))
+        ids = [keys.id(f"u{k}-[]-v") for k in range(20)]
+        db = Database(os.path.join(path, "data.json"), keys)
+        log = Log(os.path.join(path, "log.jsonl"), keys)
+        autosaver = Autosaver(db, log, every=1)
+        for t in range(1, 6):
+            for id in ids:
+                i = db.row(id)
+                db.set_entry(i, _entry(t))
+                db.touch(i)
+                log.log(id=id, time=t, event="DRILL", data={})
+            autosaver.poll()
+        for id in ids[::2]:
+            db.set_entry(db.find(id), _entry(6))
+            db.touch(db.find(id))
+        autosaver.close()
+        db.save()
+        log.save()
+        db = Database(os.path.join(path, "data.json"), keys)
+        for k, id in enumerate(ids):
+            t = 6 if k % 2 == 0 else 5
+            self.assertEqual(db.entry(db.find(id))['lastTime'], t)
+        self.assertEqual(len(list(Log(log.path, keys).lines())), 100)
+
+
+class TestGraphCache(unittest.TestCase):
+    """
+    A cached graph is rerun when a directory the script listed, or a
+    module it imported (even one already imported), changes.
+    """
+    SCRIPT = """
+import os
+import helper
+def graph():
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(os.path.join(here, "words"))):
+        yield name, helper.SUFFIX
+"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        sys.path.insert(0, self.path)
+        self.addCleanup(sys.path.remove, self.path)
+        self.addCleanup(sys.modules.pop, "helper", None)
+        os.mkdir(os.path.join(self.path, "words"))
+        self.write("words/a", "")
+        self.write("helper.py", "SUFFIX = 'x'\n")
+        self.write("graph.py", self.SCRIPT)
+
+    def write(self, name, text):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(text)
+
+    def load(self):
+        index = load_graph(
+            os.path.join(self.path, "graph.py"),
+            os.path.join(self.path, "graph.cache"),
+        )
+        return sorted(key for *_, key in index.links)
+
+    def reruns(self):
+        with mock.patch("mg.data.runpy.run_path", wraps=runpy.run_path) as run:
+            self.load()
+        return run.called
+
+    def test_directory_listing(self):
+        self.assertEqual(self.load(), ["a-[]-x"])
+        self.write("words/b", "")
+        self.assertEqual(self.load(), ["a-[]-x", "b-[]-x"])
+
+    def test_imported_module(self):
+        self.load()
+        os.remove(os.path.join(self.path, "graph.cache"))
+        self.load() # with helper already imported
+        self.assertFalse(self.reruns())
+        self.write("helper.py", "SUFFIX = 'y'\n")
+        self.assertTrue(self.reruns())
+
+
+if __name__ == "__main__":
+    unittest.main()
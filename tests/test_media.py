@@ -0,0 +1,99 @@
+import os
+import sys
+import shutil
+import threading
+import tempfile
+import unittest
+from unittest import mock
+
+from mg import media
+
+
+class RecordingEngine(media.Espeak):
+    """
+    An engine whose utterances are appended to a file (one per line),
+    and whose stream command does not exist.
+    """
+    def __init__(self, path):
+        super().__init__("mg-no-such-engine")
+        self.path = path
+    def speak_args(self, text, voice):
+        script = "import sys; open(sys.argv[1], 'a').write(sys.argv[2] + '\\n')"
+        return [sys.executable, "-c", script, self.path, text]
+    def synthesise_args(self, text, voice, path):
+        script = "import sys; open(sys.argv[1], 'w').write(sys.argv[2])"
+        return [sys.executable, "-c", script, path, text]
+    def spoken(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+
+class TestSpeechPool(unittest.TestCase):
+    """
+    A pool whose engine processes fail warns and falls back to running
+    the engine once per utterance.
+    """
+    def test_fallback(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        engine = RecordingEngine(os.path.join(path, "spoken"))
+        pool = media.SpeechPool(engine, workers=2)
+        with mock.patch("sys.stderr") as stderr:
+            pool.say("eins", "de")
+            pool.say("zwei", "de")
+        self.assertTrue(pool.failed)
+        self.assertEqual(engine.spoken(), ["eins", "zwei"])
+        warning = "".join(str(c.args[0]) for c in stderr.write.call_args_list)
+        self.assertEqual(warning.count("WARNING"), 1)
+
+
+class TestDefaultConfiguration(unittest.TestCase):
+    """
+    By default (given a command to play audio), speech is cached, and
+    upcoming speech is prefetched into the cache. Reconfiguring keeps
+    the engine processes, unless their settings change.
+    """
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        state = (media.engine, media.pool, media.cache, media.player)
+        def restore():
+            media.engine, media.pool, media.cache, media.player = state
+        self.addCleanup(restore)
+        self.engine = RecordingEngine(os.path.join(self.path, "spoken"))
+
+    def configure(self):
+        with mock.patch.dict(media.ENGINES, {"test": self.engine}), \
+                mock.patch("mg.media.shutil.which", return_value="/bin/aplay"):
+            media.configure(
+                engine_name="test",
+                cache_path=os.path.join(self.path, "audio"),
+            )
+
+    def test_cache_enabled(self):
+        self.configure()
+        self.assertIsNone(media.pool)
+        self.assertIsNotNone(media.cache)
+
+    def test_pool_kept(self):
+        with mock.patch.dict(media.ENGINES, {"test": self.engine}):
+            media.configure(engine_name="test", workers=2)
+            pool = media.pool
+            media.configure(engine_name="test", workers=2)
+            self.assertIs(media.pool, pool)
+            media.configure(engine_name="test", workers=1)
+        self.assertTrue(pool.closed)
+        self.assertIsNot(media.pool, pool)
+
+    def test_prefetch(self):
+        self.configure()
+        media.prefetch("eins", "de")
+        done = threading.Event()
+        media.daemon().schedule(done.set, priority=media.PREFETCH)
+        self.assertTrue(done.wait(10))
+        with open(media.cache.file("eins", "de")) as f:
+            self.assertEqual(f.read(), "eins")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import random
+import unittest
+
+import mg.webisu as webisu
+import mg.webisu.batch as batch
+
+
+def _models(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        webisu.Model(rng.uniform(1, 5), rng.uniform(1, 5), rng.uniform(60, 1e6))
+        for _ in range(n)
+    ]
+
+
+def _columns(models):
+    return tuple(map(list, zip(*models)))
+
+
+class TestRecallAtZeroElapsed(unittest.TestCase):
+    """
+    Just after a review, expected recall is 1 (and never more), whichever
+    path computes it, and however its normalising constants were cached.
+    """
+    def check(self, n):
+        models = _models(n)
+        probs = webisu.p_recall_t_mean_batch(
+            [0] * n,
+            _columns(models),
+            [m.ln_gamma_ratio for m in models],
+        )
+        self.assertTrue(all(p <= 1 for p in probs), max(probs))
+        self.assertAlmostEqual(min(probs), 1.0, places=9)
+
+    def test_scalar(self):
+        for m in _models(100):
+            self.assertLessEqual(webisu.p_recall_t_mean(0, m), 1)
+
+    def test_pure_python(self):
+        numpy = batch._NUMPY
+        batch._NUMPY = False # (as if NumPy were not installed)
+        try:
+            self.check(batch.NUMPY_MIN_BATCH)
+        finally:
+            batch._NUMPY = numpy
+
+    def test_numpy(self):
+        if batch._numpy() is None:
+            self.skipTest("NumPy is not installed")
+        self.check(batch.NUMPY_MIN_BATCH)
+
+
+if __name__ == "__main__":
+    unittest.main()